@@ -0,0 +1,31 @@
+"""Compare AES backends on gateway sized payloads.
+
+Run with: python -m benchmarks.bench_aes
+"""
+import timeit
+
+from bosch_thermostat_http.encryption import Encryption, available_backends
+
+from .payloads import ACCESS_KEY, PASSWORD, encrypted_payloads
+
+NUMBER = 200
+
+
+def main():
+    """Print per call decrypt and encrypt cost for each backend."""
+    bodies = encrypted_payloads(Encryption(ACCESS_KEY, PASSWORD))
+    print("%-16s %8s %-14s %12s %12s" % ("payload", "bytes", "backend", "decrypt us", "encrypt us"))
+    for name, body in bodies.items():
+        for backend in available_backends():
+            encryption = Encryption(ACCESS_KEY, PASSWORD, backend=backend)
+            plain = encryption.decrypt(body)
+            dec = timeit.timeit(lambda: encryption.decrypt(body), number=NUMBER)
+            enc = timeit.timeit(lambda: encryption.encrypt(plain), number=NUMBER)
+            print(
+                "%-16s %8d %-14s %12.1f %12.1f"
+                % (name, len(body), backend, dec / NUMBER * 1e6, enc / NUMBER * 1e6)
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""Compare legacy decrypt + json.loads path with fused Encryption.decode.
+
+Run with: python -m benchmarks.bench_decode [--pyaes]
+pyaes backend is slow under tracemalloc, so it is measured only on request.
+"""
+import json
+import sys
+import timeit
+import tracemalloc
+
+from bosch_thermostat_http.const import PYAES
+from bosch_thermostat_http.encryption import (
+    Encryption,
+    available_backends,
+    available_json_parsers,
+)
+
+from .payloads import ACCESS_KEY, PASSWORD, encrypted_payloads
+
+NUMBER = 500
+NUMBER_PYAES = 10
+
+
+def legacy(encryption, body):
+    """Decode as it was done before fused pipeline."""
+    return json.loads(encryption.decrypt(body))
+
+
+def peak_allocation(func, body):
+    """Return peak bytes allocated while decoding single body."""
+    func(body)
+    tracemalloc.start()
+    func(body)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def main():
+    bodies = encrypted_payloads(Encryption(ACCESS_KEY, PASSWORD))
+    print(
+        "%-16s %8s %-14s %-8s %-8s %10s %10s %12s"
+        % ("payload", "bytes", "backend", "parser", "path", "us/call", "MB/s", "peak bytes")
+    )
+    for name, body in bodies.items():
+        for backend in available_backends():
+            if backend == PYAES and "--pyaes" not in sys.argv:
+                continue
+            for parser in available_json_parsers():
+                encryption = Encryption(ACCESS_KEY, PASSWORD, backend=backend, json_parser=parser)
+                paths = {
+                    "legacy": lambda raw: legacy(encryption, raw),
+                    "fused": encryption.decode,
+                }
+                for path, func in paths.items():
+                    if path == "legacy" and parser != available_json_parsers()[0]:
+                        continue
+                    number = NUMBER_PYAES if backend == PYAES else NUMBER
+                    elapsed = timeit.timeit(lambda: func(body), number=number) / number
+                    print(
+                        "%-16s %8d %-14s %-8s %-8s %10.1f %10.1f %12d"
+                        % (
+                            name,
+                            len(body),
+                            backend,
+                            parser if path == "fused" else "json",
+                            path,
+                            elapsed * 1e6,
+                            len(body) / elapsed / 1e6,
+                            peak_allocation(func, body),
+                        )
+                    )
+
+
+if __name__ == "__main__":
+    main()
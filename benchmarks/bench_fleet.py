@@ -0,0 +1,88 @@
+"""Measure poll throughput of GatewayFleet with many simulated gateways.
+
+Startup is time until every gateway was discovered and polled once, the
+rest is measured in steady state afterwards. All gateways are served by one local fake gateway reached on distinct
+127.x.y.z addresses. Run with: python -m benchmarks.bench_fleet
+"""
+import asyncio
+import logging
+import time
+
+from bosch_thermostat_http.encryption import Encryption
+from bosch_thermostat_http.fleet import GatewayFleet
+
+from .fake_gateway import FakeGateway, rc300_responses
+from .payloads import ACCESS_KEY, PASSWORD
+
+GATEWAYS = 500
+LATENCY = 0.05
+POLL_INTERVAL = 5
+DURATION = 15
+MAX_CONCURRENCY = (32, 128)
+
+
+async def run(server, encryption, max_concurrency):
+    fleet = GatewayFleet(
+        max_concurrency=max_concurrency, poll_interval=POLL_INTERVAL, max_in_flight=4
+    )
+    for host in server.hosts(GATEWAYS):
+        await fleet.add(host, encryption.key)
+    start = time.perf_counter()
+    await fleet.start()
+    while fleet.stats["polls"] < GATEWAYS:
+        await asyncio.sleep(0.1)
+    startup = time.perf_counter() - start
+    polls = fleet.stats["polls"]
+    server.requests = 0
+    start = time.perf_counter()
+    await asyncio.sleep(DURATION)
+    await fleet.stop()
+    elapsed = time.perf_counter() - start
+    health = fleet.health.values()
+    latencies = sorted(item["latency"] for item in health if item["latency"])
+    stats = fleet.stats
+    await fleet.close()
+    print(
+        "%12d %10.1f %8d %8d %10.1f %12.1f %12.0f %12.0f"
+        % (
+            max_concurrency,
+            startup,
+            stats["healthy"],
+            stats["polls"] - polls,
+            (stats["polls"] - polls) / elapsed,
+            server.requests / elapsed,
+            latencies[len(latencies) // 2] * 1000 if latencies else 0,
+            latencies[int(len(latencies) * 0.95)] * 1000 if latencies else 0,
+        )
+    )
+
+
+async def main():
+    logging.disable(logging.ERROR)
+    encryption = Encryption(ACCESS_KEY, PASSWORD)
+    server = FakeGateway(encryption, rc300_responses(), LATENCY)
+    await server.start("0.0.0.0")
+    print(
+        "%d gateways, %d ms latency, poll every %d s, %d s run"
+        % (GATEWAYS, LATENCY * 1000, POLL_INTERVAL, DURATION)
+    )
+    print(
+        "%12s %10s %8s %8s %10s %12s %12s %12s"
+        % (
+            "concurrency",
+            "startup s",
+            "healthy",
+            "polls",
+            "polls/s",
+            "requests/s",
+            "p50 ms",
+            "p95 ms",
+        )
+    )
+    for max_concurrency in MAX_CONCURRENCY:
+        await run(server, encryption, max_concurrency)
+    await server.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
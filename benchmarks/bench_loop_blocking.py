@@ -0,0 +1,76 @@
+"""Measure how long response decoding blocks event loop.
+
+Run with: python -m benchmarks.bench_loop_blocking
+"""
+import asyncio
+import time
+
+import aiohttp
+
+from bosch_thermostat_http.const import PROCESS, THREAD
+from bosch_thermostat_http.encryption import Encryption, available_backends
+from bosch_thermostat_http.http_connector import HttpConnector
+
+from .fake_gateway import FakeGateway
+from .payloads import ACCESS_KEY, PASSWORD, references, system_info
+
+REQUESTS = 20
+TICK = 0.001
+
+
+async def ticker(stop, lags):
+    """Record how late event loop wakes up from short sleeps."""
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(TICK)
+        lags.append(time.perf_counter() - start - TICK)
+
+
+async def run(host, session, backend, executor):
+    encryption = Encryption(ACCESS_KEY, PASSWORD, backend=backend)
+    connector = HttpConnector(host, session, encryption, executor=executor)
+    stop = asyncio.Event()
+    lags = []
+    tick = asyncio.ensure_future(ticker(stop, lags))
+    start = time.perf_counter()
+    for _ in range(REQUESTS):
+        await connector.get("/system/info")
+        await connector.get("/references")
+    total = time.perf_counter() - start
+    stop.set()
+    await tick
+    await connector.close()
+    stats = connector.decode_stats
+    print(
+        "%-14s %-8s %10.1f %12.2f %12.2f %10d"
+        % (
+            backend,
+            executor,
+            total * 1000,
+            max(lags) * 1000,
+            stats["inline_time"] * 1000,
+            stats["offloaded"],
+        )
+    )
+
+
+async def main():
+    encryption = Encryption(ACCESS_KEY, PASSWORD)
+    server = FakeGateway(
+        encryption,
+        {"/system/info": system_info(), "/references": references()},
+    )
+    await server.start()
+    print(
+        "%-14s %-8s %10s %12s %12s %10s"
+        % ("backend", "executor", "total ms", "max lag ms", "blocked ms", "offloaded")
+    )
+    async with aiohttp.ClientSession() as session:
+        for backend in available_backends():
+            for executor in (None, THREAD, PROCESS):
+                await run(server.host, session, backend, executor)
+    await server.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
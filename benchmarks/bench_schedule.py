@@ -0,0 +1,119 @@
+"""Measure cost of schedule properties read by entities on every state write.
+
+Legacy lookup parses gateway time and sorts copy of switch points on every
+call, compiled one bisects week minute index and reuses result until next
+switch point.
+
+Run with: python -m benchmarks.bench_schedule
+"""
+import time
+from datetime import datetime
+
+from bosch_thermostat_http.const import (
+    ACTIVE_PROGRAM,
+    DATE_FORMAT,
+    DAYOFWEEK,
+    DAYS_INT,
+    MAX,
+    MIN,
+    MODE,
+    SETPOINT,
+    STATE,
+    SWITCH_POINTS,
+    SWITCHPROGRAM,
+    TEMP,
+    TIME,
+    URI,
+    VALUE,
+)
+from bosch_thermostat_http.schedule import Schedule, sort_switchpoints
+
+CALLS = 20000
+POINTS_PER_DAY = (2, 6)
+SETPOINT_NAMES = ("comfort2", "comfort1", "eco")
+
+
+class OpMode:
+    is_manual = False
+    is_auto = True
+    current_mode = "auto"
+
+
+class LegacySchedule(Schedule):
+    """Schedule with lookup as it was before compiled index."""
+
+    def get_temp_in_schedule(self):
+        bosch_date = datetime.strptime(self.time, DATE_FORMAT)
+        switch_points = self._switch_points.copy()
+        current_setpoint = {
+            DAYOFWEEK: DAYS_INT[bosch_date.weekday()],
+            SETPOINT: "",
+            TIME: self._get_minutes_since_midnight(bosch_date),
+        }
+        switch_points.append(current_setpoint)
+        switch_points.sort(key=sort_switchpoints)
+        setpoint = switch_points[switch_points.index(current_setpoint) - 1][SETPOINT]
+        return {
+            MODE: setpoint,
+            TEMP: self._setpoints_temp[setpoint][VALUE],
+            MAX: self._setpoints_temp[setpoint][MAX],
+            MIN: self._setpoints_temp[setpoint][MIN],
+            URI: self._setpoints_temp[setpoint][URI],
+        }
+
+
+def make_schedule(cls, points_per_day):
+    step = 1440 // points_per_day
+    switch_points = [
+        {
+            DAYOFWEEK: day,
+            SETPOINT: SETPOINT_NAMES[index % len(SETPOINT_NAMES)],
+            TIME: index * step,
+        }
+        for day in DAYS_INT
+        for index in range(points_per_day)
+    ]
+    setpoints = {
+        name: {MODE: name, VALUE: 20, MAX: 30, MIN: 5, URI: f"/sp/{name}"}
+        for name in SETPOINT_NAMES
+    }
+    schedule = cls(None, "hc", "hc1", None, None, "EMS", {SWITCHPROGRAM: "/{}/{}"}, OpMode())
+    schedule.restore(
+        {
+            ACTIVE_PROGRAM: "A",
+            SWITCH_POINTS: switch_points,
+            SETPOINT: setpoints,
+            STATE: True,
+        },
+        "2020-01-08T13:37:00",
+    )
+    return schedule
+
+
+def read_properties(schedule):
+    schedule.get_temp_for_current_mode()
+    schedule.get_max_temp_for_mode()
+    schedule.get_min_temp_for_mode()
+    schedule.get_setpoint_for_current_mode()
+
+
+def measure(schedule):
+    start = time.perf_counter()
+    for _ in range(CALLS):
+        read_properties(schedule)
+    return (time.perf_counter() - start) / (CALLS * 4) * 1e6
+
+
+def main():
+    print("%14s %12s %14s %10s" % ("points/day", "legacy us", "compiled us", "speedup"))
+    for points_per_day in POINTS_PER_DAY:
+        legacy = measure(make_schedule(LegacySchedule, points_per_day))
+        compiled = measure(make_schedule(Schedule, points_per_day))
+        print(
+            "%14d %12.2f %14.2f %9.1fx"
+            % (points_per_day, legacy, compiled, legacy / compiled)
+        )
+
+
+if __name__ == "__main__":
+    main()
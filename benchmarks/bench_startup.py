@@ -0,0 +1,105 @@
+"""Measure Gateway.initialize and get_capabilities against local fake gateway.
+
+Last table compares cold start with warm restart from discovery cache.
+
+Run with: python -m benchmarks.bench_startup
+"""
+import asyncio
+import os
+import tempfile
+import time
+
+import aiohttp
+
+from bosch_thermostat_http.encryption import Encryption
+from bosch_thermostat_http.gateway import Gateway
+
+from .fake_gateway import FakeGateway, rc300_responses
+from .payloads import ACCESS_KEY, PASSWORD
+
+LATENCIES = (0.05, 0.3)
+MAX_IN_FLIGHT = (1, 4, 8)
+
+
+async def main():
+    encryption = Encryption(ACCESS_KEY, PASSWORD)
+    server = FakeGateway(encryption, rc300_responses(heating_circuits=4, dhw_circuits=2))
+    await server.start()
+    print(
+        "%10s %14s %12s %14s %10s %10s  %s"
+        % (
+            "rtt ms",
+            "max_in_flight",
+            "startup ms",
+            "discovery ms",
+            "lazy ms",
+            "requests",
+            "per type ms",
+        )
+    )
+    async with aiohttp.ClientSession() as session:
+        for latency in LATENCIES:
+            server.latency = latency
+            for max_in_flight in MAX_IN_FLIGHT:
+                gateway = Gateway(
+                    session,
+                    server.host,
+                    encryption.key,
+                    max_in_flight=max_in_flight,
+                )
+                server.requests = 0
+                start = time.perf_counter()
+                await gateway.initialize()
+                elapsed = time.perf_counter() - start
+                assert gateway.uuid and gateway.database
+                start = time.perf_counter()
+                await gateway.get_capabilities()
+                discovery = time.perf_counter() - start
+                requests = server.requests
+                lazy_gateway = Gateway(
+                    session,
+                    server.host,
+                    encryption.key,
+                    max_in_flight=max_in_flight,
+                )
+                await lazy_gateway.initialize()
+                start = time.perf_counter()
+                await lazy_gateway.get_capabilities(lazy=True)
+                lazy = time.perf_counter() - start
+                timings = " ".join(
+                    "%s=%.0f" % (circuit, seconds * 1000)
+                    for circuit, seconds in gateway.discovery_timings.items()
+                )
+                print(
+                    "%10d %14d %12.1f %14.1f %10.1f %10d  %s"
+                    % (
+                        latency * 1000,
+                        max_in_flight,
+                        elapsed * 1000,
+                        discovery * 1000,
+                        lazy * 1000,
+                        requests,
+                        timings,
+                    )
+                )
+        print()
+        print("%10s %12s %10s %12s %10s" % ("rtt ms", "cold ms", "requests", "warm ms", "requests"))
+        for latency in LATENCIES:
+            server.latency = latency
+            path = os.path.join(tempfile.mkdtemp(), "discovery.json")
+            row = [latency * 1000]
+            for _ in range(2):
+                gateway = Gateway(session, server.host, encryption.key, max_in_flight=4)
+                server.requests = 0
+                start = time.perf_counter()
+                assert await gateway.initialize_from_cache(path)
+                row += [(time.perf_counter() - start) * 1000, server.requests]
+                if gateway.revalidation:
+                    await gateway.revalidation
+            os.unlink(path)
+            print("%10d %12.1f %10d %12.1f %10d" % tuple(row))
+    await server.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
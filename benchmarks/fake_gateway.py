@@ -0,0 +1,179 @@
+"""Local fake Bosch gateway serving encrypted JSON over HTTP."""
+import asyncio
+import json
+
+from aiohttp import web
+
+from bosch_thermostat_http.const import APP_JSON
+
+
+class FakeGateway:
+    """Serve given path -> json dict mapping with optional latency."""
+
+    def __init__(self, encryption, responses, latency=0):
+        """
+        :param obj encryption: Encryption object used to encrypt responses.
+        :param dict responses: path -> json serializable dict.
+        :param float latency: seconds to sleep before each response.
+        """
+        self._encryption = encryption
+        self._bodies = {}
+        self.latency = latency
+        self.requests = 0
+        self._runner = None
+        self.port = None
+        for path, response in responses.items():
+            self.set_response(path, response)
+
+    def set_response(self, path, response):
+        """Change response served for path."""
+        self._bodies[path] = self._encryption.encrypt(json.dumps(response))
+
+    async def _handle(self, request):
+        self.requests += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        body = self._bodies.get(request.path)
+        if body is None:
+            return web.Response(status=404)
+        if request.method == "PUT":
+            return web.Response(status=204)
+        return web.Response(body=body, content_type=APP_JSON)
+
+    async def start(self, address="127.0.0.1"):
+        """
+        Start server on random port.
+
+        Bind to 0.0.0.0 to reach it on every 127.x.y.z address, as if it was
+        many gateways.
+        """
+        app = web.Application()
+        app.router.add_route("*", "/{tail:.*}", self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, address, 0)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+
+    @property
+    def host(self):
+        """Host string to pass to Gateway or HttpConnector."""
+        return f"127.0.0.1:{self.port}"
+
+    def hosts(self, count):
+        """Distinct host strings of server started on 0.0.0.0."""
+        return [
+            f"127.{idx // 62500 + 1}.{idx // 250 % 250}.{idx % 250 + 1}:{self.port}"
+            for idx in range(count)
+        ]
+
+    async def stop(self):
+        """Stop server."""
+        await self._runner.cleanup()
+
+
+def _value(path, value, **extra):
+    data = {"id": path, "type": "floatValue", "writeable": 1, "value": value}
+    data.update(extra)
+    return data
+
+
+def _refs(path, children):
+    return {
+        "id": path,
+        "type": "refEnum",
+        "references": [{"id": f"{path}/{child}"} for child in children],
+    }
+
+
+def _switch_program(path, setpoint_property, setpoints):
+    points = [
+        {"dayOfWeek": day, "setpoint": setpoints[idx % 2], "time": time}
+        for day in ("Mo", "Tu", "We", "Th", "Fr", "Sa", "Su")
+        for idx, time in enumerate((360, 480, 1020, 1320))
+    ]
+    return {
+        "id": path,
+        "type": "switchProgram",
+        "setpointProperty": {"id": setpoint_property},
+        "switchPoints": points,
+    }
+
+
+def rc300_responses(heating_circuits=1, dhw_circuits=1, uuid="123456789"):
+    """Responses of RC300 gateway with given number of circuits."""
+    responses = {
+        "/gateway/uuid": _value("/gateway/uuid", uuid),
+        "/system/bus": _value("/system/bus", "EMS"),
+        "/gateway/versionFirmware": _value("/gateway/versionFirmware", "04.06.07"),
+        "/system/brand": _value("/system/brand", "Buderus"),
+        "/system/info": {"id": "/system/info", "values": [{"Id": "158"}]},
+        "/system/systemType": _value("/system/systemType", "WLAN"),
+        "/gateway/DateTime": _value("/gateway/DateTime", "2020-01-06T12:00:00"),
+        "/system/sensors/temperatures/outdoor_t1": _value(
+            "/system/sensors/temperatures/outdoor_t1", 5.0
+        ),
+    }
+    hc_refs = (
+        "roomtemperature",
+        "operationMode",
+        "manualRoomSetpoint",
+        "temporaryRoomSetpoint",
+        "status",
+        "activeSwitchProgram",
+    )
+    hcs = [f"hc{idx}" for idx in range(1, heating_circuits + 1)]
+    responses["/heatingCircuits"] = _refs("/heatingCircuits", hcs)
+    for hc in hcs:
+        base = f"/heatingCircuits/{hc}"
+        responses[base] = _refs(base, hc_refs)
+        responses[f"{base}/roomtemperature"] = _value(f"{base}/roomtemperature", 21.5)
+        responses[f"{base}/operationMode"] = _value(
+            f"{base}/operationMode", "auto", allowedValues=["manual", "auto"]
+        )
+        responses[f"{base}/manualRoomSetpoint"] = _value(
+            f"{base}/manualRoomSetpoint", 21.0, minValue=5.0, maxValue=30.0
+        )
+        responses[f"{base}/temporaryRoomSetpoint"] = _value(
+            f"{base}/temporaryRoomSetpoint", -1, minValue=5.0, maxValue=30.0
+        )
+        responses[f"{base}/status"] = _value(f"{base}/status", "ACTIVE")
+        responses[f"{base}/activeSwitchProgram"] = _value(
+            f"{base}/activeSwitchProgram", "A"
+        )
+        responses[f"{base}/switchPrograms/A"] = _switch_program(
+            f"{base}/switchPrograms/A",
+            f"{base}/temperatureLevels",
+            ("comfort2", "eco"),
+        )
+        for level, temp in (("comfort2", 21.0), ("eco", 17.0)):
+            responses[f"{base}/temperatureLevels/{level}"] = _value(
+                f"{base}/temperatureLevels/{level}", temp, minValue=5.0, maxValue=30.0
+            )
+    dhw_refs = (
+        "actualTemp",
+        "operationMode",
+        "currentSetpoint",
+        "status",
+        "switchPrograms",
+    )
+    dhws = [f"dhw{idx}" for idx in range(1, dhw_circuits + 1)]
+    responses["/dhwCircuits"] = _refs("/dhwCircuits", dhws)
+    for dhw in dhws:
+        base = f"/dhwCircuits/{dhw}"
+        responses[base] = _refs(base, dhw_refs)
+        responses[f"{base}/actualTemp"] = _value(f"{base}/actualTemp", 50.0)
+        responses[f"{base}/operationMode"] = _value(
+            f"{base}/operationMode", "ownprogram", allowedValues=["Off", "high", "ownprogram"]
+        )
+        responses[f"{base}/currentSetpoint"] = _value(f"{base}/currentSetpoint", 55.0)
+        responses[f"{base}/status"] = _value(f"{base}/status", "ACTIVE")
+        responses[f"{base}/switchPrograms"] = _refs(f"{base}/switchPrograms", ("A",))
+        responses[f"{base}/switchPrograms/A"] = _switch_program(
+            f"{base}/switchPrograms/A", f"{base}/temperatureLevels", ("high", "low")
+        )
+        for level, temp in (("off", 10.0), ("high", 60.0), ("low", 40.0), ("eco", 45.0)):
+            responses[f"{base}/temperatureLevels/{level}"] = _value(
+                f"{base}/temperatureLevels/{level}", temp, minValue=10.0, maxValue=80.0
+            )
+    return responses
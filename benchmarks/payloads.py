@@ -0,0 +1,120 @@
+"""Gateway sized JSON payloads used by benchmarks."""
+import json
+
+from bosch_thermostat_http.const import DAYS_INT
+from bosch_thermostat_http.encryption import Encryption
+
+ACCESS_KEY = "abc1abc2abc3abc4"
+PASSWORD = "passworddddd"
+
+
+def temperature():
+    """Single value ref, most common response."""
+    return {
+        "id": "/heatingCircuits/hc1/roomtemperature",
+        "type": "floatValue",
+        "writeable": 0,
+        "recordable": 0,
+        "value": 21.5,
+        "unitOfMeasure": "C",
+        "minValue": -3276.8,
+        "maxValue": 3276.7,
+        "state": [{"open": -3276.8}, {"short": 3276.7}],
+    }
+
+
+def operation_mode():
+    """Operation mode with allowed values."""
+    return {
+        "id": "/heatingCircuits/hc1/operationMode",
+        "type": "stringValue",
+        "writeable": 1,
+        "recordable": 0,
+        "value": "auto",
+        "allowedValues": ["manual", "auto"],
+    }
+
+
+def switch_program():
+    """Week program with 6 switch points a day."""
+    points = []
+    for day in DAYS_INT:
+        for idx, time in enumerate((360, 480, 720, 840, 1020, 1320)):
+            points.append(
+                {
+                    "dayOfWeek": day,
+                    "setpoint": "comfort2" if idx % 2 == 0 else "eco",
+                    "time": time,
+                }
+            )
+    return {
+        "id": "/heatingCircuits/hc1/switchPrograms/A",
+        "type": "switchProgram",
+        "setpointProperty": {
+            "id": "/heatingCircuits/hc1/temperatureLevels",
+            "uri": "http://THERMOSTAT/heatingCircuits/hc1/temperatureLevels",
+        },
+        "maxNbOfSwitchPoints": 42,
+        "maxNbOfSwitchPointsPerDay": 6,
+        "switchPointTimeRaster": 15,
+        "writeable": 1,
+        "recordable": 0,
+        "switchPoints": points,
+    }
+
+
+def system_info():
+    """Large /system/info response."""
+    return {
+        "id": "/system/info",
+        "type": "arrayData",
+        "writeable": 0,
+        "recordable": 0,
+        "values": [
+            {
+                "Id": 158 + idx,
+                "Type": "Controller" if idx == 0 else "Module",
+                "Index": idx,
+                "SerialNumber": "0123456789%02d" % idx,
+                "ProductionDate": "2019-01-01",
+                "BusId": idx,
+                "Version": "04.07.1%d" % (idx % 10),
+                "VersionHardware": "%02d.00" % idx,
+                "Brand": "Buderus",
+            }
+            for idx in range(24)
+        ],
+    }
+
+
+def references(count=200):
+    """Rawscan like subtree with many references."""
+    return {
+        "id": "/system/sensors/temperatures",
+        "type": "refEnum",
+        "references": [
+            {
+                "id": "/system/sensors/temperatures/t%d" % idx,
+                "uri": "http://THERMOSTAT/system/sensors/temperatures/t%d" % idx,
+            }
+            for idx in range(count)
+        ],
+    }
+
+
+PAYLOADS = {
+    "temperature": temperature,
+    "operation_mode": operation_mode,
+    "switch_program": switch_program,
+    "system_info": system_info,
+    "references": references,
+}
+
+
+def encrypted_payloads(encryption=None):
+    """Return dict of name -> encrypted body as sent by gateway."""
+    encryption = encryption if encryption else Encryption(ACCESS_KEY, PASSWORD)
+    return {
+        name: encryption.encrypt(json.dumps(factory()))
+        for name, factory in PAYLOADS.items()
+    }
@@ -0,0 +1,203 @@
+"""Bounded caches used by HTTP connector."""
+import hashlib
+import sys
+import time
+from collections import OrderedDict
+from fnmatch import fnmatchcase
+
+from .const import TTL, URIS
+
+
+def copy_json(obj):
+    """Copy parsed JSON object. Much cheaper than copy.deepcopy."""
+    if isinstance(obj, dict):
+        return {key: copy_json(val) for key, val in obj.items()}
+    if isinstance(obj, list):
+        return [copy_json(val) for val in obj]
+    return obj
+
+
+def json_size(obj):
+    """Estimate memory used by parsed JSON object in bytes."""
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        for key, val in obj.items():
+            size += sys.getsizeof(key) + json_size(val)
+    elif isinstance(obj, list):
+        for val in obj:
+            size += json_size(val)
+    return size
+
+
+def body_digest(raw):
+    """Digest of raw response body used as cache key."""
+    return hashlib.blake2b(raw, digest_size=16).digest()
+
+
+class LRUCache:
+    """
+    Least recently used cache bounded by entries and bytes.
+
+    Size of each entry is given by caller when storing.
+    """
+
+    def __init__(self, max_entries, max_bytes=None):
+        """
+        :param int max_entries: 0 disables cache.
+        :param int max_bytes: memory cap, None for unlimited.
+        """
+        self._data = OrderedDict()
+        self._max_entries = max_entries
+        self._max_bytes = max_bytes
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    @property
+    def enabled(self):
+        """Check if cache stores anything."""
+        return self._max_entries > 0
+
+    def get(self, key, default=None):
+        """Get value and mark it as recently used."""
+        try:
+            value, _ = self._data[key]
+        except KeyError:
+            self._misses += 1
+            return default
+        self._data.move_to_end(key)
+        self._hits += 1
+        return value
+
+    def set(self, key, value, size=0):
+        """Store value, evicting least recently used entries over limits."""
+        if not self.enabled or (self._max_bytes is not None and size > self._max_bytes):
+            return
+        self.pop(key)
+        self._data[key] = (value, size)
+        self._bytes += size
+        while len(self._data) > self._max_entries or (
+            self._max_bytes is not None and self._bytes > self._max_bytes
+        ):
+            _, (_, old_size) = self._data.popitem(last=False)
+            self._bytes -= old_size
+            self._evictions += 1
+
+    def pop(self, key):
+        """Remove entry, return its value or None."""
+        entry = self._data.pop(key, None)
+        if entry:
+            self._bytes -= entry[1]
+            return entry[0]
+        return None
+
+    def clear(self):
+        """Remove all entries."""
+        self._data.clear()
+        self._bytes = 0
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def __len__(self):
+        return len(self._data)
+
+    @property
+    def stats(self):
+        """Return hit/miss counters and usage."""
+        lookups = self._hits + self._misses
+        return {
+            "hits": self._hits,
+            "misses": self._misses,
+            "hit_rate": self._hits / lookups if lookups else 0.0,
+            "evictions": self._evictions,
+            "entries": len(self._data),
+            "bytes": self._bytes,
+        }
+
+
+class ResponseCache:
+    """
+    Cache of parsed GET responses with TTL classes.
+
+    Config comes from db json "cache" section: "ttl" maps class name to
+    seconds (null never expires), "uris" maps class name to list of paths,
+    which may contain shell wildcards like /heatingCircuits/*/status.
+    """
+
+    def __init__(self, max_entries, config=None):
+        self._entries = LRUCache(max_entries)
+        self._ttl = {}
+        self._uris = {}
+        self._patterns = []
+        self._hits = 0
+        self._misses = 0
+        self._config = None
+        if config:
+            self.configure(config)
+
+    def configure(self, config):
+        """Replace TTL classes and URI assignment, keep entries if unchanged."""
+        if config == self._config:
+            return
+        self._config = config
+        self._ttl = dict(config.get(TTL, {}))
+        self._uris = {}
+        self._patterns = []
+        for ttl_class, uris in config.get(URIS, {}).items():
+            for uri in uris:
+                if any(char in uri for char in "*?["):
+                    self._patterns.append((uri, ttl_class))
+                else:
+                    self._uris[uri] = ttl_class
+        self._entries.clear()
+
+    def ttl_class(self, path):
+        """Return TTL class of path, None if path is not cached."""
+        ttl_class = self._uris.get(path)
+        if ttl_class is None:
+            for pattern, pattern_class in self._patterns:
+                if fnmatchcase(path, pattern):
+                    ttl_class = pattern_class
+                    break
+        return ttl_class if ttl_class in self._ttl else None
+
+    def get(self, path):
+        """Return cached response or None if missing or expired."""
+        if self.ttl_class(path) is None:
+            return None
+        entry = self._entries.get(path)
+        if entry is None or (entry[0] is not None and entry[0] <= time.monotonic()):
+            self._misses += 1
+            return None
+        self._hits += 1
+        return entry[1]
+
+    def set(self, path, data):
+        """Store response if path has TTL class."""
+        ttl_class = self.ttl_class(path)
+        if ttl_class is None:
+            return
+        ttl = self._ttl[ttl_class]
+        expires = time.monotonic() + ttl if ttl is not None else None
+        self._entries.set(path, (expires, data))
+
+    def invalidate(self, path=None):
+        """Drop cached response of path, everything if path is None."""
+        if path is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(path)
+
+    @property
+    def stats(self):
+        """Return hit/miss counters."""
+        lookups = self._hits + self._misses
+        stats = self._entries.stats
+        stats.update(
+            hits=self._hits,
+            misses=self._misses,
+            hit_rate=self._hits / lookups if lookups else 0.0,
+        )
+        return stats
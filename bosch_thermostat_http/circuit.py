@@ -1,5 +1,7 @@
 """Main circuit object."""
+import asyncio
 import logging
+import time
 from .const import (
     ID,
     CURRENT_TEMP,
@@ -28,10 +30,17 @@ from .const import (
     MIN_VALUE,
     MAX_VALUE,
     VALUE,
+    SCHEDULE,
+    TIMELINE_RESOLUTION,
+    FORECAST_HOURS,
+    SWITCH_TIMER_DELAY,
+    TARGET_TEMPERATURE,
 )
+from .cache import copy_json
+from .events import ChangeEvent
 from .helper import BoschSingleEntity
 from .exceptions import DeviceException
-from .schedule import Schedule
+from .schedule import Schedule, SwitchProgramEdit, constant_timeline, forecast_window
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -43,10 +52,22 @@ class OperationModeHelper:
         self._operation_mode = {}
         self._uri = False
         self._mode_to_setpoint = mode_to_setpoint
+        self.restored = False
 
     def init_op_mode(self, operation_mode, uri):
         self._operation_mode = operation_mode
         self._uri = uri
+        self.restored = False
+
+    def snapshot(self):
+        """Return operation mode with its allowed values."""
+        return {RESULT: copy_json(self._operation_mode), URI: self._uri}
+
+    def restore(self, snapshot):
+        """Restore operation mode saved by snapshot."""
+        if snapshot.get(URI):
+            self.init_op_mode(copy_json(snapshot.get(RESULT, {})), snapshot[URI])
+            self.restored = True
 
     def set_new_operation_mode(self, value):
         self._operation_mode[self._str.val] = value
@@ -106,10 +127,36 @@ class BasicCircuit(BoschSingleEntity):
         super().__init__(name, connector, attr_id, _type, str_obj)
         self._main_uri = f"/{CIRCUIT_TYPES[_type]}/{self.name}"
         self._operation_mode = {}
+        self._materialized = True
         for key, value in self._db[REFS].items():
             uri = f"{self._main_uri}/{value[ID]}"
             self._data[key] = {RESULT: {}, URI: uri, TYPE: value[TYPE]}
 
+    @property
+    def materialized(self):
+        """Check if circuit data was fetched, lazy circuits are stubs until then."""
+        return self._materialized
+
+    def make_lazy(self):
+        """Turn circuit into stub which is skipped by update_all until materialized."""
+        self._materialized = False
+
+    async def materialize(self):
+        """Fetch data of lazy circuit on first use."""
+        if not self._materialized:
+            await self.update()
+
+    def refresh_refs(self):
+        """Return refs fetched by update, none for lazy stub."""
+        if not self._materialized:
+            return {}
+        return super().refresh_refs()
+
+    async def update(self):
+        """Update info about circuit asynchronously."""
+        self._materialized = True
+        await super().update()
+
     @property
     def db_json(self):
         """Give simple json scheme of circuit."""
@@ -147,26 +194,86 @@ class Circuit(BasicCircuit):
     def __init__(self, connector, attr_id, db, str_obj, _type, bus_type, current_date):
         """Initialize circuit with get, put and id from gateway."""
         super().__init__(connector, attr_id, db, str_obj, _type, bus_type)
-        self._op_mode = OperationModeHelper(
-            self.name, self._db.get(MODE_TO_SETPOINT), str_obj
-        )
-        self._schedule = Schedule(
-            connector,
-            _type,
-            self.name,
-            current_date,
-            str_obj,
-            bus_type,
-            self._db,
-            self._op_mode,
-        )
+        self._current_date = current_date
+        self._op_mode_helper = None
+        self._schedule_helper = None
         self._target_temp = 0
+        self._switch_delay = None
+        self._switch_handle = None
+        self._switch_task = None
+        self._switch_state = None
+
+    @property
+    def _op_mode(self):
+        """Operation mode helper, created on first use."""
+        if self._op_mode_helper is None:
+            self._op_mode_helper = OperationModeHelper(
+                self.name, self._db.get(MODE_TO_SETPOINT), self._str
+            )
+        return self._op_mode_helper
+
+    @property
+    def _schedule(self):
+        """Schedule of circuit, created on first use."""
+        if self._schedule_helper is None:
+            self._schedule_helper = Schedule(
+                self._connector,
+                self._type,
+                self.name,
+                self._current_date,
+                self._str,
+                self._bus_type,
+                self._db,
+                self._op_mode,
+            )
+        return self._schedule_helper
 
     @property
     def schedule(self):
         """Retrieve schedule of HC/DHW."""
         return self._schedule
 
+    def edit_schedule(self):
+        """
+        Return batch of switch point edits of active program.
+
+        Upload it with commit() or use it as async context manager, see
+        set_switch_points.
+        """
+        return SwitchProgramEdit(self._schedule, self.set_switch_points)
+
+    async def set_switch_points(self, switch_points):
+        """
+        Upload switch points of active program, see Schedule.set_switch_points.
+
+        Switch timer is armed for the new program and setpoint and
+        target_temperature change events are emitted. Return True if uploaded.
+        """
+        old = (self.setpoint, self.target_temperature)
+        if not await self._schedule.set_switch_points(switch_points):
+            return False
+        self._emit_switch_changes(*old)
+        if self._switch_delay is not None:
+            self._arm_switch_timer()
+        return True
+
+    def snapshot(self):
+        """Return circuit data with operation modes and schedule."""
+        snapshot = super().snapshot()
+        if self._op_mode_helper:
+            snapshot[OPERATION_MODE] = self._op_mode.snapshot()
+        if self._schedule_helper:
+            snapshot[SCHEDULE] = self._schedule.snapshot()
+        return snapshot
+
+    def restore(self, snapshot, time=None):
+        """Restore circuit saved by snapshot."""
+        super().restore(snapshot, time)
+        if snapshot.get(OPERATION_MODE):
+            self._op_mode.restore(snapshot[OPERATION_MODE])
+        if snapshot.get(SCHEDULE):
+            self._schedule.restore(snapshot[SCHEDULE], time)
+
     @property
     def _hastates(self):
         """Get dictionary which converts Bosch states to HA States."""
@@ -311,6 +418,29 @@ class Circuit(BasicCircuit):
             self._target_temp = target_temp
         return self._target_temp
 
+    def timeline(self, resolution=TIMELINE_RESOLUTION):
+        """
+        Return target temperature of whole week, see Schedule.timeline.
+
+        Circuit which is off, manual or without schedule keeps its current
+        target temperature all week.
+        """
+        if self._op_mode.is_off:
+            return constant_timeline(0, resolution)
+        if not self._op_mode.is_manual:
+            timeline = self._schedule.timeline(resolution)
+            if len(timeline):
+                return timeline
+        return constant_timeline(self.target_temperature, resolution)
+
+    def forecast(self, hours=FORECAST_HOURS, resolution=TIMELINE_RESOLUTION):
+        """Return target temperatures from current slot for hours."""
+        timeline = self.timeline(resolution)
+        start = self._schedule.current_slot(resolution)
+        if start is None:
+            return timeline[:0]
+        return forecast_window(timeline, start, int(hours * 60) // resolution)
+
     @property
     def active_program_setpoint(self):
         return self._op_mode.temp_setpoint(self.schedule.active_program)
@@ -382,24 +512,132 @@ class Circuit(BasicCircuit):
         )
         return False
 
+    def refresh_refs(self):
+        """Return refs fetched by update as key -> uri."""
+        if not self._materialized:
+            return {}
+        return {key: item[URI] for key, item in self._data.items()}
+
+    async def process_update(self, key, result):
+        """Process fresh response of ref, refresh schedule and operation modes."""
+        item = self._data[key]
+        self.process_results(result, key)
+        if item[TYPE] == ACTIVE_PROGRAM:
+            active_program = self.get_activeswitchprogram(result)
+            if active_program:
+                await self._schedule.update_schedule(active_program)
+        if (
+            (not self._op_mode.is_set or self._op_mode.restored)
+            and item[TYPE] == OPERATION_MODE
+            and result
+        ):
+            self._op_mode.init_op_mode(
+                self.process_results(result, key, True), item[URI]
+            )
+
+    def finish_update(self, error=None):
+        """
+        Set state after refs were updated.
+
+        Failed refs don't mark circuit unavailable, state is kept then.
+        """
+        if not error:
+            self._state = True
+        if self._op_mode_helper:
+            self._connector.warm_put_cache(self._op_mode.available_modes)
+        if self._schedule_helper:
+            self._connector.warm_put_cache(
+                setpoint[VALUE] for setpoint in self._schedule.setpoints.values()
+            )
+        if self._switch_delay is not None:
+            self._arm_switch_timer()
+
+    @property
+    def switch_timer_armed(self):
+        """Check if setpoint refresh is waiting for next switch point."""
+        return self._switch_handle is not None
+
+    def start_switch_timer(self, delay=SWITCH_TIMER_DELAY):
+        """
+        Refresh setpoint and target temperature at every switch point.
+
+        Timer fires delay seconds after switch point by gateway clock,
+        emits ChangeEvent of setpoint and target_temperature and is armed
+        again. It waits while circuit isn't in auto mode, every update
+        arms it again.
+        """
+        self._switch_delay = delay
+        self._arm_switch_timer()
+
+    def stop_switch_timer(self):
+        """Stop refreshing at switch points."""
+        self._switch_delay = None
+        self._cancel_switch_timer()
+        if self._switch_task and not self._switch_task.done():
+            self._switch_task.cancel()
+
+    def _cancel_switch_timer(self):
+        if self._switch_handle:
+            self._switch_handle.cancel()
+            self._switch_handle = None
+
+    def _arm_switch_timer(self):
+        self._cancel_switch_timer()
+        if not self._materialized or not self._op_mode.is_auto:
+            return
+        seconds = self._schedule.seconds_to_switch()
+        if seconds is None:
+            return
+        self._switch_state = (self.setpoint, self.target_temperature)
+        self._switch_handle = asyncio.get_running_loop().call_later(
+            max(seconds, 0) + self._switch_delay, self._on_switch
+        )
+
+    def _on_switch(self):
+        self._switch_handle = None
+        self._switch_task = asyncio.ensure_future(self._switch())
+
+    async def _switch(self):
+        """Refresh data which changes at switch point."""
+        try:
+            try:
+                await self._schedule.refresh_active_setpoint()
+            except DeviceException as err:
+                _LOGGER.debug("Can't refresh setpoint of %s: %s", self.name, err)
+            if self._temp_setpoint in self._data:
+                await self.update_requested_key(self._temp_setpoint)
+            self._emit_switch_changes(*self._switch_state)
+        except Exception:  # pylint: disable=broad-except
+            _LOGGER.exception("Error refreshing %s at switch point", self.name)
+        finally:
+            if self._switch_delay is not None:
+                self._arm_switch_timer()
+
+    def _emit_switch_changes(self, old_setpoint, old_target):
+        """Emit ChangeEvent of setpoint and target temperature if they changed."""
+        if not self._bus.active:
+            return
+        timestamp = time.time()
+        for field, old, new in (
+            (SETPOINT, old_setpoint, self.setpoint),
+            (TARGET_TEMPERATURE, old_target, self.target_temperature),
+        ):
+            if old != new:
+                self._bus.emit(ChangeEvent(self, SCHEDULE, field, old, new, timestamp))
+
     async def update(self):
         """Update info about Circuit asynchronously."""
         _LOGGER.debug("Updating circuit %s", self.name)
-        last_item = list(self._data.keys())[-1]
-        for key, item in self._data.items():
-            is_operation_type = item[TYPE] == OPERATION_MODE
+        self._materialized = True
+        refs = self.refresh_refs()
+        last_item = list(refs)[-1]
+        error = None
+        for key, uri in refs.items():
             try:
-                result = await self._connector.get(item[URI])
-                self.process_results(result, key)
-            except DeviceException:
+                result = await self._connector.get(uri)
+            except DeviceException as err:
+                if key == last_item:
+                    error = err
                 continue
-            if item[TYPE] == ACTIVE_PROGRAM:
-                active_program = self.get_activeswitchprogram(result)
-                if active_program:
-                    await self._schedule.update_schedule(active_program)
-            if not self._op_mode.is_set and is_operation_type and result:
-                self._op_mode.init_op_mode(
-                    self.process_results(result, key, True), item[URI]
-                )
-            if key == last_item:
-                self._state = True
+            await self.process_update(key, result)
+        self.finish_update(error)
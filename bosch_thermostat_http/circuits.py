@@ -1,4 +1,6 @@
 """Circuits module of Bosch thermostat."""
+import asyncio
+
 from .const import ID, CIRCUIT_TYPES, HC, DHW, SC
 from .helper import BoschEntities, BoschSingleEntity
 from .circuit import Circuit, BasicCircuit
@@ -25,23 +27,62 @@ class Circuits(BoschEntities):
         """Get circuits."""
         return self.get_items()
 
-    async def initialize(self, database, str_obj, current_date):
-        """Initialize HeatingCircuits asynchronously."""
+    async def initialize(
+        self, database, str_obj, current_date, parallelism=None, lazy=False
+    ):
+        """
+        Initialize HeatingCircuits asynchronously.
+
+        :param int parallelism: circuits initialized at once, None for all.
+        :param bool lazy: don't fetch status, circuits are stubs until
+            materialize() or update() is called.
+        """
         if not self._circuit_type:
             return None
         db_prefix = CIRCUIT_TYPES[self._circuit_type]
         if db_prefix not in database:
             return None
         circuits = await self.retrieve_from_module(1, f"/{db_prefix}")
+        circuit_objects = []
         for circuit in circuits:
             if "references" in circuit:
                 circuit_object = self.create_circuit(
                     circuit, database, str_obj, current_date
                 )
                 if circuit_object:
+                    circuit_objects.append(circuit_object)
+        if lazy:
+            for circuit_object in circuit_objects:
+                circuit_object.make_lazy()
+            self._items.extend(circuit_objects)
+            return
+        semaphore = asyncio.Semaphore(parallelism) if parallelism else None
+
+        async def initialize_single(circuit_object):
+            if semaphore:
+                async with semaphore:
                     await circuit_object.initialize()
-                    if circuit_object.state:
-                        self._items.append(circuit_object)
+            else:
+                await circuit_object.initialize()
+
+        await asyncio.gather(*(initialize_single(c) for c in circuit_objects))
+        for circuit_object in circuit_objects:
+            if circuit_object.state:
+                self._items.append(circuit_object)
+
+    def restore(self, database, str_obj, current_date, snapshots, time=None):
+        """Create circuits from snapshots without asking gateway."""
+        for snapshot in snapshots:
+            circuit_object = self.create_circuit(
+                snapshot, database, str_obj, current_date
+            )
+            if circuit_object:
+                circuit_object.restore(snapshot, time)
+                self._items.append(circuit_object)
+
+    def snapshot(self):
+        """Return snapshots of all circuits."""
+        return [circuit.snapshot() for circuit in self._items]
 
     def create_circuit(self, circuit, database, str_obj, current_date):
         """Create single circuit of given type."""
@@ -0,0 +1,113 @@
+"""Local model of gateway clock."""
+import logging
+import time
+from datetime import datetime, timedelta
+
+from .const import CLOCK_DRIFT, CLOCK_MIN_RESYNC, CLOCK_RESYNC, DATE_FORMAT
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def parse_gateway_time(value):
+    """Parse gateway DateTime value, None if it is not valid."""
+    try:
+        return datetime.strptime(value[:19], DATE_FORMAT)
+    except (TypeError, ValueError):
+        return None
+
+
+class GatewayClock:
+    """
+    Gateway time derived from monotonic local clock.
+
+    Gateway time is fetched once and advanced locally. It is fetched again
+    after resync interval. If prediction was off by more than drift
+    tolerance, interval is halved down to CLOCK_MIN_RESYNC, otherwise it
+    grows back to resync_interval.
+    """
+
+    def __init__(self, fetch, resync_interval=CLOCK_RESYNC, drift_tolerance=CLOCK_DRIFT):
+        """
+        :param fetch: coroutine function returning gateway DateTime value.
+        :param float resync_interval: longest seconds between fetches.
+        :param float drift_tolerance: seconds prediction may be off.
+        """
+        self._fetch = fetch
+        self.resync_interval = resync_interval
+        self.drift_tolerance = drift_tolerance
+        self._interval = resync_interval
+        self._reference = None
+        self._synced_at = None
+        self._syncs = 0
+        self._drift = None
+
+    @property
+    def synced(self):
+        """Check if gateway time is known."""
+        return self._reference is not None
+
+    def datetime(self):
+        """Return current gateway time as datetime, None if not synced."""
+        if self._reference is None:
+            return None
+        return self._reference + timedelta(seconds=time.monotonic() - self._synced_at)
+
+    @property
+    def time(self):
+        """Return current gateway time in gateway format, None if not synced."""
+        now = self.datetime()
+        return now.strftime(DATE_FORMAT) if now else None
+
+    def observe(self, value, at=None):
+        """
+        Adjust model to gateway time seen at monotonic time at.
+
+        Return drift of model in seconds, None if there was no model yet.
+        """
+        observed = parse_gateway_time(value)
+        if observed is None:
+            return None
+        at = time.monotonic() if at is None else at
+        drift = None
+        if self._reference is not None:
+            predicted = self._reference + timedelta(seconds=at - self._synced_at)
+            drift = (observed - predicted).total_seconds()
+            if abs(drift) > self.drift_tolerance:
+                _LOGGER.debug("Gateway clock drifted by %.0f s", drift)
+                self._interval = max(self._interval / 2, CLOCK_MIN_RESYNC)
+            else:
+                self._interval = min(self._interval * 2, self.resync_interval)
+            self._drift = drift
+        # gateway reports whole seconds, assume middle of that second
+        self._reference = observed + timedelta(seconds=0.5)
+        self._synced_at = at
+        return drift
+
+    @property
+    def due(self):
+        """Check if gateway time should be fetched again."""
+        return (
+            self._reference is None
+            or time.monotonic() - self._synced_at >= self._interval
+        )
+
+    async def sync(self):
+        """Fetch gateway time and adjust model."""
+        sent = time.monotonic()
+        value = await self._fetch()
+        self._syncs += 1
+        self.observe(value, (sent + time.monotonic()) / 2)
+        return value
+
+    async def now(self):
+        """Return current gateway time, fetching it when resync is due."""
+        if self.due:
+            value = await self.sync()
+            if not self.synced:
+                return value
+        return self.time
+
+    @property
+    def stats(self):
+        """Return number of fetches, last measured drift and resync interval."""
+        return {"syncs": self._syncs, "drift": self._drift, "interval": self._interval}
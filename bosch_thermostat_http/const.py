@@ -4,6 +4,16 @@ BS = 16
 MAGIC = bytearray.fromhex(
     "867845e97c4e29dce522b9a7d3a3e07b152bffadddbed7f5ffd842e9895ad1e4")
 
+""" AES backends. """
+PYAES = "pyaes"
+CRYPTOGRAPHY = "cryptography"
+AES_BACKEND_ENV = "BOSCH_AES_BACKEND"
+
+""" JSON parsers. """
+STDLIB_JSON = "json"
+ORJSON = "orjson"
+JSON_PARSER_ENV = "BOSCH_JSON_PARSER"
+
 GET = "get"
 SUBMIT = "submit"
 NAME = "name"
@@ -26,6 +36,7 @@ MODELS = "models"
 # PRESETS = "presets"
 TEMP = "temp"
 DATE = "dateTime"
+DATE_FORMAT = "%Y-%m-%dT%H:%M:%S"
 
 """ New refs scheme. """
 OPERATION_MODE = "operation_mode"
@@ -89,6 +100,71 @@ HTTP_HEADER = {
 }
 
 TIMEOUT = 10
+TIMEOUT_FLOOR = 2
+RETRY_ATTEMPTS = 2
+BREAKER_THRESHOLD = 5
+BREAKER_RESET = 30
+DISCOVERY_PARALLELISM = 4
+
+""" Discovery cache. """
+DEVICE = "device"
+BUS_TYPE = "bus_type"
+CAPABILITIES = "capabilities"
+DB = "db"
+SCHEDULE = "schedule"
+
+""" Polling scheduler. """
+REFRESH = "refresh"
+
+""" Gateway clock model, seconds. """
+CLOCK_RESYNC = 900
+CLOCK_MIN_RESYNC = 60
+CLOCK_DRIFT = 30
+
+""" Schedule timeline, minutes and hours. """
+TIMELINE_RESOLUTION = 15
+FORECAST_HOURS = 24
+
+""" Seconds setpoint response is shared between schedules. """
+SETPOINT_MAX_AGE = 10
+
+""" Seconds after switch point its setpoint is fetched. """
+SWITCH_TIMER_DELAY = 5
+TARGET_TEMPERATURE = "target_temperature"
+
+""" Fleet of gateways. """
+FLEET_CONCURRENCY = 64
+POLL_INTERVAL = 30
+
+""" Response decoding offload. """
+THREAD = "thread"
+PROCESS = "process"
+OFFLOAD_THRESHOLD = 4096
+
+""" Connector caches. """
+DECODE_CACHE_SIZE = 256
+DECODE_CACHE_BYTES = 1024 * 1024
+PUT_CACHE_SIZE = 64
+NEGATIVE_CACHE_SIZE = 1024
+NEGATIVE_CACHE_TTL = 3600
+RESPONSE_CACHE_SIZE = 512
+RECENT_CACHE_SIZE = 128
+CACHE = "cache"
+TTL = "ttl"
+URIS = "uris"
+STATIC = "static"
+SLOW = "slow"
+VOLATILE = "volatile"
+
+""" Request priorities, lower rank is served first. """
+INTERACTIVE = "interactive"
+FOLLOWUP = "followup"
+BACKGROUND = "background"
+PRIORITIES = {INTERACTIVE: 0, FOLLOWUP: 1, BACKGROUND: 2}
+FOLLOWUP_WINDOW = 10
+
+""" Connection pool owned by connector. """
+KEEPALIVE_TIMEOUT = 10
 
 HEATING_CIRCUITS = "heatingCircuits"
 DHW_CIRCUITS = "dhwCircuits"
@@ -115,6 +191,8 @@ RC300 = "RC300"
 SETPOINT_PROP = "setpointProperty"
 SWITCH_POINTS = "switchPoints"
 SWITCHPROGRAM = "switchprogram"
+MAX_SWITCH_POINTS_PER_DAY = "maxNbOfSwitchPointsPerDay"
+SWITCH_POINT_RASTER = "switchPointTimeRaster"
 MIDNIGHT = 1440
 DAYS = {
     "Mo": "monday",
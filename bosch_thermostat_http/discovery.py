@@ -0,0 +1,118 @@
+"""Persistent cache of gateway discovery result."""
+import asyncio
+import json
+import logging
+import os
+import tempfile
+
+from .version import __version__
+
+_LOGGER = logging.getLogger(__name__)
+
+GATEWAYS = "gateways"
+LIBRARY = "library"
+
+
+def discovery_key(uuid, firmware):
+    """Key of discovery result, new firmware means new discovery."""
+    return f"{uuid}/{firmware}"
+
+
+class DiscoveryCache:
+    """
+    JSON file with discovery results of gateways.
+
+    Every gateway keeps only result of its current firmware. Results stored
+    by other library version are ignored, as db scheme could change.
+    File is read once and written in executor, saves arriving during
+    write are stored together by next write.
+    """
+
+    def __init__(self, path):
+        """:param str path: file to store results in."""
+        self._path = path
+        self._gateways = None
+        self._lock = None
+        self._writer = None
+        self._dirty = False
+
+    @property
+    def path(self):
+        """Return path of cache file."""
+        return self._path
+
+    def _read(self):
+        try:
+            with open(self._path, "r") as cache_file:
+                data = json.load(cache_file)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as err:
+            _LOGGER.warning("Discovery cache %s is unreadable: %s", self._path, err)
+            return {}
+        if not isinstance(data, dict) or data.get(LIBRARY) != __version__:
+            return {}
+        return data.get(GATEWAYS, {})
+
+    def _write(self, gateways):
+        directory = os.path.dirname(os.path.abspath(self._path))
+        handle, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(handle, "w") as cache_file:
+                json.dump({LIBRARY: __version__, GATEWAYS: gateways}, cache_file)
+            os.replace(tmp_path, self._path)
+        except (OSError, TypeError, ValueError) as err:
+            _LOGGER.warning("Can't write discovery cache %s: %s", self._path, err)
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+
+    async def _contents(self):
+        """Return stored results, reading file on first use."""
+        if self._gateways is None:
+            if self._lock is None:
+                self._lock = asyncio.Lock()
+            async with self._lock:
+                if self._gateways is None:
+                    loop = asyncio.get_running_loop()
+                    self._gateways = await loop.run_in_executor(None, self._read)
+        return self._gateways
+
+    async def _flush(self):
+        """Write results, joining write which is already running."""
+        self._dirty = True
+        if self._writer is None or self._writer.done():
+            self._writer = asyncio.ensure_future(self._write_pending())
+        await asyncio.shield(self._writer)
+
+    async def _write_pending(self):
+        loop = asyncio.get_running_loop()
+        while self._dirty:
+            self._dirty = False
+            await loop.run_in_executor(None, self._write, dict(self._gateways))
+
+    async def load(self, uuid, firmware):
+        """Return discovery result of gateway, None if missing."""
+        if not uuid or not firmware:
+            return None
+        return (await self._contents()).get(discovery_key(uuid, firmware))
+
+    async def save(self, uuid, firmware, result):
+        """Store discovery result, replacing results of older firmwares."""
+        if not uuid or not firmware:
+            return
+        gateways = await self._contents()
+        for key in [key for key in gateways if key.startswith(f"{uuid}/")]:
+            del gateways[key]
+        gateways[discovery_key(uuid, firmware)] = result
+        await self._flush()
+
+    async def invalidate(self, uuid):
+        """Drop stored results of gateway."""
+        gateways = await self._contents()
+        keys = [key for key in gateways if key.startswith(f"{uuid}/")]
+        if keys:
+            for key in keys:
+                del gateways[key]
+            await self._flush()
@@ -3,23 +3,190 @@ import base64
 import hashlib
 import binascii
 import json
+import os
+import threading
 
-from pyaes import PADDING_NONE, AESModeOfOperationECB, Decrypter, Encrypter
+from pyaes import AESModeOfOperationECB
 
-from .const import BS, MAGIC
+from .const import (
+    BS,
+    MAGIC,
+    AES_BACKEND_ENV,
+    CRYPTOGRAPHY,
+    PYAES,
+    JSON_PARSER_ENV,
+    ORJSON,
+    STDLIB_JSON,
+)
 from .exceptions import EncryptionException, DeviceException
 
+try:
+    from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+except ImportError:  # pragma: no cover - optional dependency
+    Cipher = None
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+
+class PyaesBackend:
+    """Pure Python AES-ECB backend. Always available."""
+
+    name = PYAES
+
+    def __init__(self, key):
+        """Expand key once, ECB mode keeps no state between blocks."""
+        self._aes = AESModeOfOperationECB(key)
+
+    def encrypt(self, data):
+        """Encrypt block aligned bytes."""
+        return b"".join(
+            self._aes.encrypt(data[i : i + BS]) for i in range(0, len(data), BS)
+        )
+
+    def decrypt(self, data):
+        """Decrypt block aligned bytes."""
+        return b"".join(
+            self._aes.decrypt(data[i : i + BS]) for i in range(0, len(data), BS)
+        )
+
+    def decrypt_into(self, data, buf):
+        """Decrypt block aligned bytes into buf, return written length."""
+        for i in range(0, len(data), BS):
+            buf[i : i + BS] = self._aes.decrypt(data[i : i + BS])
+        return len(data)
+
+
+class CryptographyBackend:
+    """OpenSSL AES-ECB backend provided by cryptography package."""
+
+    name = CRYPTOGRAPHY
+
+    def __init__(self, key):
+        """
+        Prepare cipher.
+
+        ECB keeps no state between blocks, so cipher contexts are never
+        finalized and get reused. Contexts are not thread safe, so each
+        thread gets its own pair.
+        """
+        self._cipher = Cipher(algorithms.AES(key), modes.ECB())
+        self._local = threading.local()
+
+    def _context(self, name, factory):
+        context = getattr(self._local, name, None)
+        if context is None:
+            context = factory()
+            setattr(self._local, name, context)
+        return context
+
+    def encrypt(self, data):
+        """Encrypt block aligned bytes."""
+        return self._context("encryptor", self._cipher.encryptor).update(data)
+
+    def decrypt(self, data):
+        """Decrypt block aligned bytes."""
+        return self._context("decryptor", self._cipher.decryptor).update(data)
+
+    def decrypt_into(self, data, buf):
+        """Decrypt block aligned bytes into buf, return written length."""
+        return self._context("decryptor", self._cipher.decryptor).update_into(
+            data, buf
+        )
+
+
+AES_BACKENDS = {PYAES: PyaesBackend}
+if Cipher is not None:
+    AES_BACKENDS[CRYPTOGRAPHY] = CryptographyBackend
+
+
+def available_backends():
+    """List names of AES backends usable in this environment."""
+    return list(AES_BACKENDS.keys())
+
+
+def default_backend_name():
+    """
+    Pick AES backend.
+
+    BOSCH_AES_BACKEND environment variable wins if it names available backend,
+    otherwise OpenSSL one is preferred over pure Python.
+    """
+    requested = os.environ.get(AES_BACKEND_ENV)
+    if requested in AES_BACKENDS:
+        return requested
+    return CRYPTOGRAPHY if CRYPTOGRAPHY in AES_BACKENDS else PYAES
+
+
+def get_backend(key, name=None):
+    """Create AES backend object for given key."""
+    name = name if name else default_backend_name()
+    if name not in AES_BACKENDS:
+        raise EncryptionException(
+            f"AES backend {name} is not available. Choose one of {available_backends()}"
+        )
+    return AES_BACKENDS[name](key)
+
+
+def _stdlib_loads(data):
+    """Parse JSON from str or utf8 bytes like object with json module."""
+    if not isinstance(data, str):
+        data = str(data, "utf8")
+    return json.loads(data)
+
+
+JSON_PARSERS = {STDLIB_JSON: _stdlib_loads}
+if orjson is not None:
+    JSON_PARSERS[ORJSON] = orjson.loads
+
+
+def available_json_parsers():
+    """List names of JSON parsers usable in this environment."""
+    return list(JSON_PARSERS.keys())
+
+
+def default_json_parser_name():
+    """Pick JSON parser, BOSCH_JSON_PARSER env wins, orjson preferred."""
+    requested = os.environ.get(JSON_PARSER_ENV)
+    if requested in JSON_PARSERS:
+        return requested
+    return ORJSON if ORJSON in JSON_PARSERS else STDLIB_JSON
+
+
+_PROCESS_ENCRYPTIONS = {}
+
+
+def decode_response(key, backend, raw):
+    """
+    Decrypt and parse gateway response in executor.
+
+    Module level so it can be pickled to process pool. Encryption objects are
+    cached per worker to not rebuild AES key schedule for every response.
+    """
+    encryption = _PROCESS_ENCRYPTIONS.get((key, backend))
+    if not encryption:
+        encryption = _PROCESS_ENCRYPTIONS[(key, backend)] = Encryption(
+            key, backend=backend
+        )
+    return encryption.json_encrypt(raw)
+
 
 class Encryption:
     """Encryption class."""
 
-    def __init__(self, access_key, password=None):
+    def __init__(self, access_key, password=None, backend=None, json_parser=None):
         """
         Initialize encryption.
 
         :param str access_key: Access key to Bosch thermostat.
             If no password specified assumed as ready key to encrypt.
         :param str password: Password created with Bosch app.
+        :param str backend: Name of AES backend, see available_backends().
+            By default cryptography is used if installed, pyaes otherwise.
+        :param str json_parser: Name of JSON parser, see available_json_parsers().
+            By default orjson is used if installed, json module otherwise.
         """
         self._bs = BS
         if password and access_key:
@@ -30,29 +197,89 @@ class Encryption:
         elif access_key:
             self._saved_key = access_key
             self._key = binascii.unhexlify(self._saved_key)
+        self._backend = get_backend(self._key, backend)
+        json_parser = json_parser if json_parser else default_json_parser_name()
+        if json_parser not in JSON_PARSERS:
+            raise EncryptionException(
+                f"JSON parser {json_parser} is not available. "
+                f"Choose one of {available_json_parsers()}"
+            )
+        self._json_parser = json_parser
+        self._loads = JSON_PARSERS[json_parser]
+        self._local = threading.local()
 
     @property
     def key(self):
         """Return key to store in config entry."""
         return self._saved_key
 
+    @property
+    def backend(self):
+        """Return name of AES backend in use."""
+        return self._backend.name
+
+    @property
+    def json_parser(self):
+        """Return name of JSON parser in use."""
+        return self._json_parser
+
     def json_encrypt(self, raw):
+        """Decrypt and parse JSON response, None for empty one."""
+        if raw:
+            return self.decode(raw)
+        return None
+
+    def _buffer(self, size):
+        """Return per thread reusable buffer of at least size bytes."""
+        buf = getattr(self._local, "buf", None)
+        if buf is None or len(buf) < size:
+            buf = self._local.buf = bytearray(max(size, 1024))
+        return buf
+
+    def decode(self, enc):
+        """
+        Decrypt and parse JSON response.
+
+        With orjson it is single pass: plaintext is decrypted into reusable
+        buffer, NUL padding is cut at byte level and parser gets view of
+        buffer without extra copies. json module decodes the view to str
+        anyway, so it gets plain decrypt() output, which is as fast.
+        """
+        if not enc or len(enc) <= 2:
+            return {}
+        if self._json_parser != ORJSON:
+            return self._parse(self.decrypt(enc))
+        try:
+            data = binascii.a2b_base64(enc)
+            if len(data) % self._bs != 0:
+                data = self._pad(data)
+            buf = self._buffer(len(data) + self._bs)
+            end = self._backend.decrypt_into(data, buf)
+            del data
+        except Exception as err:
+            raise EncryptionException(f"Unable to decrypt: {err}")
+        if end >= self._bs:
+            # padding is shorter than a block, strip it on last block only
+            end -= self._bs - len(buf[end - self._bs : end].rstrip(b"\x00"))
+        while end and buf[end - 1] == 0:
+            end -= 1
+        with memoryview(buf) as view, view[:end] as plain:
+            return self._parse(plain)
+
+    def _parse(self, plain):
+        """Parse decrypted JSON."""
         try:
-            if raw:
-                return json.loads(self.decrypt(raw))
-            return None
-        except json.JSONDecodeError:
+            return self._loads(plain)
+        except (ValueError, TypeError):
             raise DeviceException(f"Unable to decode Json response.")
 
     def encrypt(self, raw):
         """Encrypt raw message."""
+        if isinstance(raw, str):
+            raw = raw.encode("utf8")
         if len(raw) % self._bs != 0:
             raw = self._pad(raw)
-        cipher = Encrypter(
-            AESModeOfOperationECB(self._key),
-            padding=PADDING_NONE)
-        ciphertext = cipher.feed(raw) + cipher.feed()
-        return base64.b64encode(ciphertext)
+        return base64.b64encode(self._backend.encrypt(raw))
 
     def decrypt(self, enc):
         """
@@ -66,10 +293,7 @@ class Encryption:
                 enc = base64.b64decode(enc)
                 if len(enc) % self._bs != 0:
                     enc = self._pad(enc)
-                cipher = Decrypter(
-                    AESModeOfOperationECB(self._key),
-                    padding=PADDING_NONE)
-                decrypted = cipher.feed(enc) + cipher.feed()
+                decrypted = self._backend.decrypt(enc)
                 return decrypted.decode("utf8").rstrip(chr(0))
             return "{}"
         except Exception as err:
@@ -77,4 +301,4 @@ class Encryption:
 
     def _pad(self, _s):
         """Pad of encryption."""
-        return _s + ((self._bs - len(_s) % self._bs) * chr(0))
+        return _s + ((self._bs - len(_s) % self._bs) * b"\x00")
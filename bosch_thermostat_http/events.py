@@ -0,0 +1,128 @@
+"""Change events of Bosch entities."""
+import asyncio
+import logging
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class ChangeEvent:
+    """Single field of entity ref which changed its value."""
+
+    __slots__ = ("entity", "key", "field", "old", "new", "timestamp")
+
+    def __init__(self, entity, key, field, old, new, timestamp):
+        self.entity = entity
+        self.key = key
+        self.field = field
+        self.old = old
+        self.new = new
+        self.timestamp = timestamp
+
+    def __repr__(self):
+        return (
+            f"ChangeEvent({self.entity.name}, {self.key}, {self.field}: "
+            f"{self.old!r} -> {self.new!r})"
+        )
+
+
+class EventIterator:
+    """
+    Async iterator over events of bus.
+
+    Queue is registered on creation and removed by aclose(), when waiting
+    for event fails or when iterator is garbage collected.
+    """
+
+    _CLOSED = object()
+
+    def __init__(self, bus, maxsize=0):
+        self._bus = bus
+        self._queue = asyncio.Queue(maxsize)
+        self._closed = False
+        bus._queues.append(self._queue)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self._closed:
+            raise StopAsyncIteration
+        try:
+            event = await self._queue.get()
+        except BaseException:
+            self._close()
+            raise
+        if event is self._CLOSED:
+            raise StopAsyncIteration
+        return event
+
+    async def aclose(self):
+        """Stop receiving events, pending iteration ends."""
+        if not self._closed:
+            self._close()
+            if self._queue.full():
+                self._queue.get_nowait()
+            self._queue.put_nowait(self._CLOSED)
+
+    def __del__(self):
+        self._close()
+
+    def _close(self):
+        self._closed = True
+        if self._queue in self._bus._queues:
+            self._bus._queues.remove(self._queue)
+
+
+class EventBus:
+    """
+    Deliver change events to callbacks and async iterators.
+
+    Events are passed to parent bus too, so gateway sees events of all
+    its entities.
+    """
+
+    def __init__(self, parent=None):
+        self.parent = parent
+        self._callbacks = []
+        self._queues = []
+
+    @property
+    def active(self):
+        """Check if anyone listens, events are not built otherwise."""
+        return bool(
+            self._callbacks or self._queues or (self.parent and self.parent.active)
+        )
+
+    def subscribe(self, callback):
+        """Call callback with every ChangeEvent, return function to unsubscribe."""
+        self._callbacks.append(callback)
+
+        def unsubscribe():
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+
+        return unsubscribe
+
+    def events(self, maxsize=0):
+        """
+        Iterate over change events.
+
+        Events are queued from this call on, not from first iteration.
+
+        :param int maxsize: queued events limit, oldest are dropped over it.
+        """
+        return EventIterator(self, maxsize)
+
+    def emit(self, event):
+        """Deliver event to subscribers."""
+        for callback in list(self._callbacks):
+            try:
+                callback(event)
+            except Exception:  # pylint: disable=broad-except
+                _LOGGER.exception("Error in change event callback %s", callback)
+        for queue in self._queues:
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(event)
+        if self.parent:
+            self.parent.emit(event)
@@ -16,6 +16,15 @@ class DeviceException(BoschException):
     pass
 
 
+class ConnectionException(DeviceException):
+    """
+    Gateway didn't answer.
+
+    Connection failed, timed out or gateway is marked unavailable.
+    Worth retrying later, unlike missing URI.
+    """
+
+
 class ResponseException(BoschException):
     """
     When trying to connect to something what is not surely Bosch."""
@@ -0,0 +1,299 @@
+"""Many gateways polled over one shared session."""
+import asyncio
+import logging
+import time
+
+from aiohttp import ClientSession, TCPConnector
+
+from .const import (
+    FLEET_CONCURRENCY,
+    FORECAST_HOURS,
+    KEEPALIVE_TIMEOUT,
+    POLL_INTERVAL,
+    TIMELINE_RESOLUTION,
+)
+from .discovery import DiscoveryCache
+from .exceptions import DeviceException
+from .gateway import Gateway
+from .request_queue import RequestQueue
+from .retry import CLOSED
+from .schedule import stack_forecasts
+
+_LOGGER = logging.getLogger(__name__)
+
+# Fractional parts of multiples of golden ratio spread evenly over interval,
+# whatever number of gateways is added.
+GOLDEN_RATIO = 0.6180339887498949
+
+
+class GatewayHealth:
+    """Poll results of single gateway."""
+
+    __slots__ = (
+        "polls",
+        "failures",
+        "consecutive_failures",
+        "last_poll",
+        "last_error",
+        "latency",
+    )
+
+    def __init__(self):
+        self.polls = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.last_poll = None
+        self.last_error = None
+        self.latency = None
+
+    def success(self, duration, alpha=0.2):
+        """Poll finished, latency is smoothed duration of update cycle."""
+        self.polls += 1
+        self.consecutive_failures = 0
+        self.last_poll = time.time()
+        self.last_error = None
+        if self.latency is None:
+            self.latency = duration
+        else:
+            self.latency = (1 - alpha) * self.latency + alpha * duration
+
+    def failure(self, error):
+        """Poll failed."""
+        self.polls += 1
+        self.failures += 1
+        self.consecutive_failures += 1
+        self.last_poll = time.time()
+        self.last_error = str(error)
+
+    @property
+    def healthy(self):
+        """Check if last poll succeeded."""
+        return self.polls > 0 and self.consecutive_failures == 0
+
+
+class GatewayFleet:
+    """
+    Poll many gateways over shared session with global concurrency cap.
+
+    Gateways share single RequestQueue, so at most max_concurrency requests
+    are in flight in total and gateways take turns. Poll of each gateway
+    starts at its own phase of poll_interval to avoid bursts.
+    """
+
+    def __init__(
+        self,
+        session=None,
+        max_concurrency=FLEET_CONCURRENCY,
+        poll_interval=POLL_INTERVAL,
+        discovery_cache=None,
+        **gateway_options,
+    ):
+        """
+        :param session: aiohttp ClientSession or None to let fleet own one.
+            Call close() then.
+        :param int max_concurrency: requests in flight to all gateways.
+        :param float poll_interval: seconds between polls of each gateway.
+        :param discovery_cache: DiscoveryCache or path to restore gateways from.
+        :param gateway_options: default keyword arguments of Gateway.
+        """
+        self._session = session
+        self._own_session = session is None
+        self._limiter = RequestQueue(max_concurrency)
+        self._poll_interval = poll_interval
+        if discovery_cache and not isinstance(discovery_cache, DiscoveryCache):
+            discovery_cache = DiscoveryCache(discovery_cache)
+        self._discovery_cache = discovery_cache
+        self._gateway_options = gateway_options
+        self._gateways = {}
+        self._health = {}
+        self._phases = {}
+        self._initialized = set()
+        self._tasks = {}
+        self._added = 0
+        self._running = False
+
+    @property
+    def session(self):
+        """Return session, owned one is created by first add()."""
+        if self._session is None:
+            self._session = ClientSession(
+                connector=TCPConnector(
+                    limit=self._limiter.max_in_flight,
+                    keepalive_timeout=KEEPALIVE_TIMEOUT,
+                    use_dns_cache=True,
+                    ttl_dns_cache=None,
+                )
+            )
+        return self._session
+
+    @property
+    def gateways(self):
+        """Return host -> Gateway mapping."""
+        return dict(self._gateways)
+
+    @property
+    def max_concurrency(self):
+        """Return requests allowed in flight to all gateways."""
+        return self._limiter.max_in_flight
+
+    def set_max_concurrency(self, max_concurrency):
+        """Change global concurrency cap."""
+        self._limiter.max_in_flight = max_concurrency
+
+    async def add(self, host, access_key, password=None, **options):
+        """Add gateway, it is polled right away if fleet is running."""
+        if host in self._gateways:
+            raise ValueError(f"Gateway {host} already in fleet")
+        gateway_options = dict(self._gateway_options)
+        gateway_options.update(options)
+        gateway = Gateway(
+            self.session,
+            host,
+            access_key,
+            password,
+            limiter=self._limiter,
+            **gateway_options,
+        )
+        self._gateways[host] = gateway
+        self._health[host] = GatewayHealth()
+        self._phases[host] = (self._added * GOLDEN_RATIO) % 1
+        self._added += 1
+        if self._running:
+            self._start(host)
+        return gateway
+
+    async def remove(self, host):
+        """Stop polling gateway and release it, unknown host is ignored."""
+        task = self._tasks.pop(host, None)
+        if task:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+        gateway = self._gateways.pop(host, None)
+        if gateway is None:
+            return
+        self._health.pop(host, None)
+        self._phases.pop(host, None)
+        self._initialized.discard(host)
+        await gateway.close()
+
+    async def _initialize(self, host, gateway):
+        if self._discovery_cache:
+            await gateway.initialize_from_cache(self._discovery_cache)
+        else:
+            await gateway.initialize()
+            if gateway.database:
+                await gateway.get_capabilities()
+        if not gateway.database:
+            raise DeviceException(f"Gateway {host} is not supported")
+        gateway.initialize_sensors()
+        self._initialized.add(host)
+
+    async def poll(self, host):
+        """Initialize gateway on first poll, run update_all cycle then."""
+        gateway = self._gateways[host]
+        health = self._health[host]
+        try:
+            if host not in self._initialized:
+                await self._initialize(host, gateway)
+            start = time.monotonic()
+            await gateway.update_all()
+            if gateway.breaker_stats["state"] != CLOSED:
+                raise DeviceException(f"Gateway {host} is not responding")
+        except DeviceException as err:
+            _LOGGER.debug("Poll of %s failed: %s", host, err)
+            health.failure(err)
+            return False
+        except Exception as err:  # pylint: disable=broad-except
+            # keep polling loop alive, next poll may succeed
+            _LOGGER.exception("Unexpected error polling %s", host)
+            health.failure(err)
+            return False
+        health.success(time.monotonic() - start)
+        return True
+
+    async def _run(self, host):
+        """Poll gateway at its phase of every interval."""
+        loop = asyncio.get_event_loop()
+        next_poll = loop.time() + self._phases[host] * self._poll_interval
+        while True:
+            await asyncio.sleep(max(next_poll - loop.time(), 0))
+            await self.poll(host)
+            next_poll += self._poll_interval
+            if next_poll < loop.time():
+                # poll overran its interval, keep phase and skip missed slots
+                missed = (loop.time() - next_poll) // self._poll_interval + 1
+                next_poll += missed * self._poll_interval
+
+    def _start(self, host):
+        self._tasks[host] = asyncio.ensure_future(self._run(host))
+
+    async def start(self):
+        """Start polling all gateways."""
+        self._running = True
+        for host in self._gateways:
+            if host not in self._tasks:
+                self._start(host)
+
+    async def stop(self):
+        """Stop polling."""
+        self._running = False
+        tasks = list(self._tasks.values())
+        self._tasks.clear()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def close(self):
+        """Stop polling and release gateways and owned session."""
+        await self.stop()
+        for host in list(self._gateways):
+            await self.remove(host)
+        if self._own_session and self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def forecast(self, hours=FORECAST_HOURS, resolution=TIMELINE_RESOLUTION):
+        """
+        Return target temperature forecast of circuits of all gateways.
+
+        Result is ((host, circuit name) keys, forecasts), forecasts of whole
+        fleet are gathered in single numpy operation if numpy is installed.
+        """
+        keys, timelines, starts = [], [], []
+        for host in self._gateways:
+            if host not in self._initialized:
+                continue
+            for circuit, timeline, start in self._gateways[host].forecast_rows(
+                resolution
+            ):
+                keys.append((host, circuit.name))
+                timelines.append(timeline)
+                starts.append(start)
+        return keys, stack_forecasts(timelines, starts, int(hours * 60) // resolution)
+
+    @property
+    def health(self):
+        """Return health and smoothed poll latency of each gateway."""
+        return {
+            host: {
+                "healthy": health.healthy,
+                "polls": health.polls,
+                "failures": health.failures,
+                "consecutive_failures": health.consecutive_failures,
+                "last_poll": health.last_poll,
+                "last_error": health.last_error,
+                "latency": health.latency,
+                "breaker": self._gateways[host].breaker_stats["state"],
+            }
+            for host, health in self._health.items()
+        }
+
+    @property
+    def stats(self):
+        """Return number of gateways, healthy ones and queued requests."""
+        return {
+            "gateways": len(self._gateways),
+            "healthy": sum(health.healthy for health in self._health.values()),
+            "polls": sum(health.polls for health in self._health.values()),
+            "waiting": self._limiter.waiting,
+        }
@@ -1,9 +1,15 @@
 """Gateway module connecting to Bosch thermostat."""
 
+import asyncio
 import logging
+import time
 from .http_connector import HttpConnector
 from .db import get_db_of_firmware, get_initial_db, get_custom_db
 from .circuits import Circuits
+from .clock import GatewayClock
+from .discovery import DiscoveryCache
+from .schedule import stack_forecasts
+from .scheduler import PollScheduler
 from .const import (
     DHW,
     DICT,
@@ -29,9 +35,23 @@ from .const import (
     EMS,
     CIRCUIT_TYPES,
     TYPE,
+    OFFLOAD_THRESHOLD,
+    KEEPALIVE_TIMEOUT,
+    CACHE,
+    DISCOVERY_PARALLELISM,
+    DEVICE,
+    BUS_TYPE,
+    CAPABILITIES,
+    DB,
+    REFRESH,
+    TIMELINE_RESOLUTION,
+    FORECAST_HOURS,
+    SWITCH_TIMER_DELAY,
 )
 from .encryption import Encryption
+from .events import EventBus
 from .exceptions import DeviceException
+from .cache import copy_json
 from .helper import deep_into
 from .sensors import Sensors
 from .strings import Strings
@@ -42,22 +62,54 @@ _LOGGER = logging.getLogger(__name__)
 class Gateway:
     """Gateway to Bosch thermostat."""
 
-    def __init__(self, session, host, access_key, password=None):
+    def __init__(
+        self,
+        session,
+        host,
+        access_key,
+        password=None,
+        aes_backend=None,
+        executor=None,
+        offload_threshold=OFFLOAD_THRESHOLD,
+        max_in_flight=1,
+        keepalive_timeout=KEEPALIVE_TIMEOUT,
+        poll_budget=None,
+        limiter=None,
+    ):
         """
         Initialize gateway.
 
+        :param session: aiohttp ClientSession or None to let gateway own
+            connection pool tuned for single host. Call close() then.
         :param access_key:
         :param password:
         :param host:
+        :param aes_backend: name of AES backend, default picks fastest available.
+        :param executor: "thread", "process" or Executor to decode big responses
+            outside of event loop.
+        :param offload_threshold: size in bytes from which responses are offloaded.
+        :param max_in_flight: maximum number of concurrent requests to gateway.
+        :param keepalive_timeout: idle keep-alive seconds of owned pool.
+        :param poll_budget: maximum URIs fetched by single update_all cycle.
+        :param limiter: RequestQueue shared with other gateways, see GatewayFleet.
         """
         self._host = host
         if password:
             access_token = access_key.replace("-", "")
-            _encryption = Encryption(access_token, password)
+            _encryption = Encryption(access_token, password, backend=aes_backend)
         else:
-            _encryption = Encryption(access_key)
-        if type(session).__name__ == "ClientSession":
-            self._connector = HttpConnector(host, session, _encryption)
+            _encryption = Encryption(access_key, backend=aes_backend)
+        if session is None or type(session).__name__ == "ClientSession":
+            self._connector = HttpConnector(
+                host,
+                session,
+                _encryption,
+                executor=executor,
+                offload_threshold=offload_threshold,
+                max_in_flight=max_in_flight,
+                keepalive_timeout=keepalive_timeout,
+                limiter=limiter,
+            )
         else:
             return
         self._data = {GATEWAY: {}, HC: None, DHW: None, SENSORS: None}
@@ -67,11 +119,17 @@ class Gateway:
         self._str = None
         self._initialized = None
         self._bus_type = None
+        self._discovery_timings = {}
+        self._revalidation = None
+        self._scheduler = PollScheduler(self._connector.get, budget=poll_budget)
+        self._bus = EventBus()
+        self._clock = GatewayClock(self._fetch_date)
 
     async def initialize(self):
         """Initialize gateway asynchronously."""
         initial_db = get_initial_db()
         self._str = Strings(initial_db[DICT])
+        self._connector.configure_response_cache(initial_db.get(CACHE))
         await self._update_info(initial_db.get(GATEWAY))
         self._firmware_version = self._data[GATEWAY].get(FIRMWARE_VERSION)
         self._device = await self.get_device_type(initial_db)
@@ -108,23 +166,39 @@ class Gateway:
                     return model
 
     async def _update_info(self, initial_db):
-        """Update gateway info from Bosch device."""
-        for name, uri in initial_db.items():
+        """
+        Update gateway info from Bosch device.
+
+        URIs are fetched concurrently within connector concurrency limit.
+        Failure of one of them doesn't affect the others.
+        """
+
+        async def update_single(name, uri):
             try:
                 response = await self._connector.get(uri)
                 if self._str.val in response:
                     self._data[GATEWAY][name] = response[self._str.val]
+                    if name == DATE:
+                        self._clock.observe(response[self._str.val])
                 elif name == SYSTEM_INFO:
                     self._data[GATEWAY][SYSTEM_INFO] = response.get(VALUES, [])
             except DeviceException as err:
                 _LOGGER.debug("Can't fetch data for update_info %s", err)
-                pass
+
+        await asyncio.gather(
+            *(update_single(name, uri) for name, uri in initial_db.items())
+        )
 
     @property
     def host(self):
         """Return host of Bosch gateway. Either IP or hostname."""
         return self._host
 
+    @property
+    def connector(self):
+        """Retrieve HTTP connector."""
+        return self._connector
+
     @property
     def device_name(self):
         """Device friendly name based on model."""
@@ -141,20 +215,83 @@ class Gateway:
         return self._data[data_type].get_items()
 
     async def current_date(self):
-        """Find current datetime of gateway."""
-        response = await self._connector.get(self._db[GATEWAY].get(DATE))
-        val = response.get(self._str.val)
+        """Find current datetime of gateway, see clock."""
+        val = await self._clock.now()
         self._data[GATEWAY][DATE] = val
         return val
 
+    async def _fetch_date(self):
+        response = await self._connector.get(self._db[GATEWAY].get(DATE))
+        return response.get(self._str.val)
+
+    @property
+    def clock(self):
+        """
+        Return model of gateway clock.
+
+        Gateway time is fetched once and advanced with local clock, then
+        fetched again every few minutes or sooner if it drifted.
+        """
+        return self._clock
+
     @property
     def database(self):
         """Retrieve db scheme."""
         return self._db
 
-    def set_timeout(self, timeout):
-        """Set timeout for API calls."""
-        self._connector.set_timeout(timeout)
+    def set_timeout(self, timeout, floor=None):
+        """Set timeout for API calls, ceiling if adaptive timeout is used."""
+        self._connector.set_timeout(timeout, floor)
+
+    def invalidate_negative_cache(self, path=None):
+        """Forget URIs known as missing, e.g. after firmware update."""
+        self._connector.invalidate_negative_cache(path)
+
+    @property
+    def breaker_stats(self):
+        """Return state of circuit breaker guarding gateway requests."""
+        return self._connector.breaker_stats
+
+    @property
+    def timeouts(self):
+        """Return learned latency and timeout of each URI."""
+        return self._connector.timeouts
+
+    def set_executor(self, executor, offload_threshold=None):
+        """Set executor used to decode big responses outside of event loop."""
+        self._connector.set_executor(executor, offload_threshold)
+
+    @property
+    def decode_stats(self):
+        """Return how much time event loop spent on decoding responses."""
+        return self._connector.decode_stats
+
+    @property
+    def request_stats(self):
+        """Return number of sent and coalesced requests."""
+        return self._connector.request_stats
+
+    @property
+    def cache_stats(self):
+        """Return hit/miss statistics of connector caches."""
+        return self._connector.cache_stats
+
+    async def close(self):
+        """Release resources owned by gateway."""
+        if self._revalidation and not self._revalidation.done():
+            self._revalidation.cancel()
+        self.stop_switch_timers()
+        await self._connector.close()
+
+    @property
+    def connection_stats(self):
+        """Return new vs reused connections if gateway owns its session."""
+        return self._connector.connection_stats
+
+    @property
+    def aes_backend(self):
+        """Return name of AES backend used for gateway traffic."""
+        return self._connector.aes_backend
 
     @property
     def access_key(self):
@@ -200,24 +337,262 @@ class Gateway:
             return self._data[GATEWAY][key]
         return None
 
-    async def get_capabilities(self):
-        supported = []
-        for circuit in CIRCUIT_TYPES.keys():
+    async def get_capabilities(self, parallelism=DISCOVERY_PARALLELISM, lazy=False):
+        """
+        Find supported circuit types.
+
+        Circuit types and circuits within type are discovered concurrently,
+        at most parallelism at once on each level. Time spent on each type
+        is available in discovery_timings. With lazy circuits are listed
+        only, see initialize_circuits.
+        """
+        semaphore = asyncio.Semaphore(parallelism) if parallelism else None
+
+        async def discover(circuit):
+            start = time.perf_counter()
             try:
-                circuit_object = await self.initialize_circuits(circuit)
-                if circuit_object:
-                    supported.append(circuit)
+                if semaphore:
+                    async with semaphore:
+                        return await self.initialize_circuits(
+                            circuit, parallelism, lazy
+                        )
+                return await self.initialize_circuits(circuit, parallelism, lazy)
             except DeviceException as err:
                 _LOGGER.debug("Circuit %s not found. Skipping it. %s", circuit, err)
-                pass
-        return supported
+            finally:
+                self._discovery_timings[circuit] = time.perf_counter() - start
+
+        circuit_types = list(CIRCUIT_TYPES.keys())
+        found = await asyncio.gather(*(discover(circuit) for circuit in circuit_types))
+        return [circuit for circuit, objects in zip(circuit_types, found) if objects]
 
-    async def initialize_circuits(self, circ_type):
-        """Initialize circuits objects of given type (dhw/hcs)."""
+    @property
+    def discovery_timings(self):
+        """Return seconds spent on discovering each circuit type."""
+        return dict(self._discovery_timings)
+
+    async def initialize_circuits(self, circ_type, parallelism=None, lazy=False):
+        """
+        Initialize circuits objects of given type (dhw/hcs).
+
+        Lazy circuits skip status check and are skipped by update_all until
+        their materialize() or update() is called.
+        """
         self._data[circ_type] = Circuits(self._connector, circ_type, self._bus_type)
-        await self._data[circ_type].initialize(self._db, self._str, self.current_date)
+        await self._data[circ_type].initialize(
+            self._db, self._str, self._clock, parallelism, lazy
+        )
+        self._attach(self.get_circuits(circ_type))
         return self.get_circuits(circ_type)
 
+    def _attach(self, entities):
+        """Forward change events of entities to gateway."""
+        for entity in entities:
+            entity.bus.parent = self._bus
+
+    def subscribe(self, callback):
+        """Call callback with ChangeEvent of every changed field of any entity."""
+        return self._bus.subscribe(callback)
+
+    def events(self, maxsize=0):
+        """
+        Async iterator of ChangeEvent of every changed field of any entity.
+
+        :param int maxsize: queued events limit, oldest are dropped over it.
+        """
+        return self._bus.events(maxsize)
+
+    async def initialize_from_cache(self, cache, revalidate=True):
+        """
+        Restore discovery result from cache, run full discovery on miss.
+
+        Only uuid, firmware and gateway time are fetched before restored
+        entities are usable. They are refreshed in background afterwards,
+        see revalidation. Firmware change means full discovery, its result
+        is stored in cache.
+
+        :param cache: DiscoveryCache or path of cache file.
+        :param bool revalidate: refresh restored entities in background.
+        :return: list of supported circuit types, None if gateway is unknown.
+        """
+        if not isinstance(cache, DiscoveryCache):
+            cache = DiscoveryCache(cache)
+        initial_db = get_initial_db()
+        self._str = Strings(initial_db[DICT])
+        self._connector.configure_response_cache(initial_db.get(CACHE))
+        info = initial_db[GATEWAY]
+        await self._update_info({key: info[key] for key in (UUID, FIRMWARE_VERSION, DATE)})
+        self._firmware_version = self._data[GATEWAY].get(FIRMWARE_VERSION)
+        snapshot = await cache.load(self.uuid, self._firmware_version)
+        if snapshot:
+            supported = self.restore(snapshot)
+            if revalidate:
+                self._revalidation = asyncio.ensure_future(self._revalidate(cache))
+                self._revalidation.add_done_callback(self._revalidation_done)
+            return supported
+        _LOGGER.debug("No discovery cache of %s, running full discovery", self.uuid)
+        await self.initialize()
+        if not self._initialized:
+            return None
+        supported = await self.get_capabilities()
+        await self._update_circuits()
+        await cache.save(self.uuid, self._firmware_version, self.snapshot())
+        return supported
+
+    @property
+    def revalidation(self):
+        """Return background task refreshing restored entities, if any."""
+        return self._revalidation
+
+    def snapshot(self):
+        """Return JSON serializable discovery result."""
+        return {
+            GATEWAY: {
+                key: copy_json(value)
+                for key, value in self._data[GATEWAY].items()
+                if key != DATE
+            },
+            DEVICE: self._device,
+            BUS_TYPE: self._bus_type,
+            DB: copy_json(self._db),
+            CAPABILITIES: {
+                circ_type: self._data[circ_type].snapshot()
+                for circ_type in CIRCUIT_TYPES
+                if self._data.get(circ_type) and self._data[circ_type].circuits
+            },
+        }
+
+    def restore(self, snapshot):
+        """Restore discovery result, return supported circuit types."""
+        gateway_time = self._data[GATEWAY].get(DATE)
+        self._data[GATEWAY] = {**copy_json(snapshot[GATEWAY]), **self._data[GATEWAY]}
+        self._device = snapshot[DEVICE]
+        self._bus_type = snapshot[BUS_TYPE]
+        self._db = copy_json(snapshot[DB])
+        self._initialized = True
+        for circ_type, circuits in snapshot[CAPABILITIES].items():
+            self._data[circ_type] = Circuits(self._connector, circ_type, self._bus_type)
+            self._data[circ_type].restore(
+                self._db, self._str, self._clock, circuits, gateway_time
+            )
+            self._attach(self._data[circ_type].circuits)
+        return [
+            circ_type
+            for circ_type in CIRCUIT_TYPES
+            if self._data.get(circ_type) and self._data[circ_type].circuits
+        ]
+
+    def _all_circuits(self):
+        return [
+            circuit
+            for circ_type in CIRCUIT_TYPES
+            if self._data.get(circ_type)
+            for circuit in self._data[circ_type].circuits
+        ]
+
+    async def _update_circuits(self):
+        await asyncio.gather(*(circuit.update() for circuit in self._all_circuits()))
+
+    def _revalidation_done(self, task):
+        """Log error of background revalidation nobody awaits."""
+        if not task.cancelled() and task.exception():
+            _LOGGER.error(
+                "Revalidation of %s failed",
+                self.uuid,
+                exc_info=task.exception(),
+            )
+
+    async def _revalidate(self, cache):
+        """
+        Refresh restored entities and store fresh discovery result.
+
+        Cache entry is dropped if device model changed or restored circuit
+        stopped responding, so next start runs full discovery.
+        """
+        initial_db = get_initial_db()
+        try:
+            await self._update_info(initial_db[GATEWAY])
+            device = await self.get_device_type(initial_db)
+            await self._update_circuits()
+        except DeviceException as err:
+            _LOGGER.debug("Can't revalidate discovery of %s: %s", self.uuid, err)
+            return
+        if device != self._device or not all(c.state for c in self._all_circuits()):
+            _LOGGER.warning(
+                "Gateway %s differs from discovery cache. Full discovery on next start.",
+                self.uuid,
+            )
+            await cache.invalidate(self.uuid)
+            return
+        await cache.save(self.uuid, self._firmware_version, self.snapshot())
+
+    async def update_all(self):
+        """
+        Update all circuits and sensors in single polling cycle.
+
+        Refs are refreshed every N cycles as set in db "refresh" section and
+        URI shared by entities is fetched once. Return number of URIs fetched.
+        """
+        self._scheduler.configure(self._db.get(REFRESH))
+        entities = self._all_circuits()
+        if self._data[SENSORS]:
+            entities.extend(self.sensors)
+        return await self._scheduler.run(entities)
+
+    @property
+    def poll_budget(self):
+        """Return maximum URIs fetched by single update_all cycle."""
+        return self._scheduler.budget
+
+    @poll_budget.setter
+    def poll_budget(self, budget):
+        self._scheduler.budget = budget
+
+    @property
+    def poll_stats(self):
+        """Return cycles, requests, deduplicated and deferred refs of update_all."""
+        return self._scheduler.stats
+
+    def start_switch_timers(self, delay=SWITCH_TIMER_DELAY):
+        """Refresh circuits at their schedule switch points, see Circuit.start_switch_timer."""
+        for circuit in self._all_circuits():
+            if hasattr(circuit, "start_switch_timer"):
+                circuit.start_switch_timer(delay)
+
+    def stop_switch_timers(self):
+        """Stop refreshing circuits at switch points."""
+        for circuit in self._all_circuits():
+            if hasattr(circuit, "stop_switch_timer"):
+                circuit.stop_switch_timer()
+
+    def forecast_rows(self, resolution=TIMELINE_RESOLUTION):
+        """Return (circuit, week timeline, current slot) of circuits with known time."""
+        rows = []
+        for circuit in self._all_circuits():
+            if not hasattr(circuit, "timeline") or not circuit.materialized:
+                continue
+            start = circuit.schedule.current_slot(resolution)
+            if start is not None:
+                rows.append((circuit, circuit.timeline(resolution), start))
+        return rows
+
+    def forecast(self, hours=FORECAST_HOURS, resolution=TIMELINE_RESOLUTION):
+        """
+        Return target temperature forecast of all heating and dhw circuits.
+
+        Result is (circuit names, forecasts), forecasts is 2D numpy array
+        with row per circuit if numpy is installed, list of arrays otherwise.
+        """
+        rows = self.forecast_rows(resolution)
+        return (
+            [circuit.name for circuit, _, _ in rows],
+            stack_forecasts(
+                [timeline for _, timeline, _ in rows],
+                [start for _, _, start in rows],
+                int(hours * 60) // resolution,
+            ),
+        )
+
     def initialize_sensors(self, choosed_sensors=None):
         """Initialize sensors objects."""
         if not choosed_sensors:
@@ -225,6 +600,7 @@ class Gateway:
         self._data[SENSORS] = Sensors(
             self._connector, choosed_sensors, self._db[SENSORS], self._str
         )
+        self._attach(self.sensors)
         return self.sensors
 
     async def rawscan(self):
@@ -257,6 +633,8 @@ class Gateway:
             if not self._initialized:
                 await self.initialize()
             else:
+                # uuid is cached forever, liveness check has to reach gateway
+                self._connector.invalidate_response_cache(self._db[GATEWAY][UUID])
                 response = await self._connector.get(self._db[GATEWAY][UUID])
                 if self._str.val in response:
                     self._data[GATEWAY][UUID] = response[self._str.val]
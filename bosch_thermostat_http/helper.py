@@ -2,8 +2,11 @@
 
 import re
 import logging
-from .const import ID, NAME, PATH, RESULT, TYPE, REGULAR, URI
+import time
+from .const import ID, NAME, PATH, RESULT, TYPE, REGULAR, URI, STATE
 
+from .cache import copy_json
+from .events import ChangeEvent, EventBus
 from .exceptions import DeviceException, EncryptionException
 
 _LOGGER = logging.getLogger(__name__)
@@ -94,16 +97,35 @@ class BoschSingleEntity:
         self._update_initialized = False
         self._state = False
         self._extra_message = "Waiting to fetch data"
+        self._bus = EventBus()
 
     @property
     def connector(self):
         """Retrieve connector."""
         return self._connector
 
+    @property
+    def bus(self):
+        """Return event bus of entity."""
+        return self._bus
+
+    def subscribe(self, callback):
+        """Call callback with ChangeEvent of every changed field."""
+        return self._bus.subscribe(callback)
+
+    def events(self, maxsize=0):
+        """Async iterator of ChangeEvent of every changed field."""
+        return self._bus.events(maxsize)
+
     def process_results(self, result, key=None, return_data=False):
-        """Convert multi-level json object to one level object."""
+        """
+        Convert multi-level json object to one level object.
+
+        Every changed field is emitted as ChangeEvent if anyone listens.
+        """
         data = {} if return_data else self._data[key][RESULT]
         updated = False
+        changes = [] if not return_data and self._bus.active else None
         if result:
             for res_key in [
                 self._str.val,
@@ -115,16 +137,49 @@ class BoschSingleEntity:
                 if res_key in result:
                     if res_key in data and result[res_key] == data[res_key]:
                         continue
+                    if changes is not None:
+                        changes.append((res_key, data.get(res_key), result[res_key]))
                     data[res_key] = result[res_key]
                     self._update_initialized = True
                     updated = True
         if self._str.state in result:
+            old_state = data.get(self._str.state)
             data[self._str.state] = {}
             for state in result[self._str.state]:
-                for key, item in state.items():
-                    data[self._str.state][key] = item
+                for state_key, item in state.items():
+                    data[self._str.state][state_key] = item
+            if changes is not None and old_state != data[self._str.state]:
+                changes.append((self._str.state, old_state, data[self._str.state]))
+        if changes:
+            timestamp = time.time()
+            for field, old, new in changes:
+                self._bus.emit(ChangeEvent(self, key, field, old, new, timestamp))
         return data if return_data else updated
 
+    def snapshot(self):
+        """Return JSON serializable data to restore entity without requests."""
+        return {
+            ID: self.attr_id,
+            STATE: bool(self._state),
+            RESULT: {
+                key: copy_json(item[RESULT])
+                for key, item in self._data.items()
+                if item[RESULT]
+            },
+        }
+
+    def restore(self, snapshot, time=None):
+        """
+        Restore data saved by snapshot.
+
+        :param str time: current gateway time, used by entities with schedule.
+        """
+        for key, result in snapshot.get(RESULT, {}).items():
+            if key in self._data:
+                self._data[key][RESULT] = copy_json(result)
+                self._update_initialized = True
+        self._state = snapshot.get(STATE, False)
+
     @property
     def state_message(self):
         """Get text state of device"""
@@ -172,15 +227,37 @@ class BoschSingleEntity:
         """Get path of Bosch API which entity is using for data."""
         return self._main_data[PATH]
 
+    @property
+    def entity_type(self):
+        """Type of Bosch entity, e.g. hc, dhw or sensor."""
+        return self._type
+
+    def refresh_refs(self):
+        """Return refs fetched by update as key -> uri."""
+        return {
+            key: item[URI] for key, item in self._data.items() if item[TYPE] == REGULAR
+        }
+
+    async def process_update(self, key, result):
+        """Process fresh response of ref."""
+        self.process_results(result, key)
+
+    def finish_update(self, error=None):
+        """Set state after refs were updated, error is DeviceException if any."""
+        if error:
+            _LOGGER.error(f"Can't update data for {self.name} with message: {error}")
+            self._state = False
+            self._extra_message = f"Can't update data. Error: {error}"
+        else:
+            self._state = True
+
     async def update(self):
         """Update info about Circuit asynchronously."""
+        error = None
         try:
-            for key, item in self._data.items():
-                if item[TYPE] == REGULAR:
-                    result = await self._connector.get(item[URI])
-                    self.process_results(result, key)
-            self._state = True
+            for key, uri in self.refresh_refs().items():
+                result = await self._connector.get(uri)
+                await self.process_update(key, result)
         except DeviceException as err:
-            _LOGGER.error(f"Can't update data for {self.name} with message: {err}")
-            self._state = False
-            self._extra_message = f"Can't update data. Error: {err}"
+            error = err
+        self.finish_update(error)
@@ -2,15 +2,53 @@
 import logging
 import asyncio
 import json
+import time
 from asyncio import TimeoutError as AsyncTimeout
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from aiohttp import ClientSession, TCPConnector, TraceConfig
 from aiohttp.client_exceptions import (
     ClientResponseError,
     ClientConnectorError,
     ClientError,
+    ServerTimeoutError,
 )
 
-from .const import HTTP_HEADER, APP_JSON
-from .exceptions import DeviceException, ResponseException
+from .cache import LRUCache, ResponseCache, body_digest, copy_json, json_size
+from .const import (
+    HTTP_HEADER,
+    APP_JSON,
+    THREAD,
+    PROCESS,
+    OFFLOAD_THRESHOLD,
+    DECODE_CACHE_SIZE,
+    DECODE_CACHE_BYTES,
+    PUT_CACHE_SIZE,
+    NEGATIVE_CACHE_SIZE,
+    NEGATIVE_CACHE_TTL,
+    RESPONSE_CACHE_SIZE,
+    RECENT_CACHE_SIZE,
+    PRIORITIES,
+    INTERACTIVE,
+    FOLLOWUP,
+    BACKGROUND,
+    FOLLOWUP_WINDOW,
+    KEEPALIVE_TIMEOUT,
+    TIMEOUT,
+    TIMEOUT_FLOOR,
+    RETRY_ATTEMPTS,
+    BREAKER_THRESHOLD,
+    BREAKER_RESET,
+)
+from .encryption import decode_response
+from .latency import LatencyTracker
+from .request_queue import RequestQueue
+from .retry import CircuitBreaker, RetryPolicy
+from .exceptions import (
+    BoschException,
+    ConnectionException,
+    DeviceException,
+    ResponseException,
+)
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -18,21 +56,364 @@ _LOGGER = logging.getLogger(__name__)
 class HttpConnector:
     """HTTP connector to Bosch thermostat."""
 
-    def __init__(self, host, websession, encryption):
-        """Init of HTTP connector."""
-        self._lock = asyncio.Lock()
+    def __init__(
+        self,
+        host,
+        websession,
+        encryption,
+        executor=None,
+        offload_threshold=OFFLOAD_THRESHOLD,
+        decode_cache_size=DECODE_CACHE_SIZE,
+        decode_cache_bytes=DECODE_CACHE_BYTES,
+        put_cache_size=PUT_CACHE_SIZE,
+        put_cache_prewarm=True,
+        max_in_flight=1,
+        priorities=None,
+        followup_window=FOLLOWUP_WINDOW,
+        limit_per_host=None,
+        keepalive_timeout=KEEPALIVE_TIMEOUT,
+        adaptive_timeout=True,
+        timeout_floor=TIMEOUT_FLOOR,
+        retry_attempts=RETRY_ATTEMPTS,
+        breaker_threshold=BREAKER_THRESHOLD,
+        breaker_reset=BREAKER_RESET,
+        negative_cache_ttl=NEGATIVE_CACHE_TTL,
+        response_cache=None,
+        limiter=None,
+    ):
+        """
+        Init of HTTP connector.
+
+        :param websession: aiohttp ClientSession. If None connector owns
+            session with connection pool tuned for single gateway and
+            counts new vs reused connections.
+
+        :param executor: decode big responses outside of event loop.
+            Either "thread", "process" or concurrent.futures.Executor object.
+            None keeps decoding on event loop.
+        :param int offload_threshold: minimum response size in bytes to offload.
+        :param int decode_cache_size: number of decoded responses remembered
+            by digest of encrypted body. 0 disables cache.
+        :param int decode_cache_bytes: memory cap of decode cache.
+        :param int put_cache_size: number of encrypted PUT bodies remembered
+            by value. 0 disables cache.
+        :param bool put_cache_prewarm: let circuits encrypt their allowed
+            modes and setpoint temperatures ahead of time.
+        :param int max_in_flight: maximum number of concurrent requests
+            to gateway. Concurrent GETs of same path share one request.
+        :param dict priorities: priority class name -> rank, lower rank is
+            served first. Defaults to interactive, followup, background.
+        :param float followup_window: seconds after PUT during which GETs
+            of the same circuit are sent with followup priority.
+        :param int limit_per_host: connections in owned pool, defaults to
+            max_in_flight as more connections would never be used.
+        :param float keepalive_timeout: seconds idle connection is kept in
+            owned pool. Should be lower than gateway idle timeout.
+        :param bool adaptive_timeout: derive timeout of each URI from its
+            observed latency. Timeout set with set_timeout is the ceiling.
+        :param float timeout_floor: lowest adaptive timeout.
+        :param int retry_attempts: tries of request failing on connection
+            error or timeout, with jittered exponential backoff between.
+        :param int breaker_threshold: consecutive connection failures after
+            which requests fail immediately without network I/O.
+        :param float breaker_reset: seconds after which single probe request
+            checks if gateway is back.
+        :param float negative_cache_ttl: seconds URI answered with 404/405 is
+            reported missing without asking gateway. 0 disables.
+        :param dict response_cache: TTL classes of responses in db json
+            "cache" format, see configure_response_cache.
+        :param limiter: RequestQueue shared by connectors of many gateways
+            to cap their requests in total. Gateways take turns by rank.
+        """
+        self._queue = RequestQueue(max_in_flight)
+        self._priorities = dict(priorities if priorities else PRIORITIES)
+        self._followup_window = followup_window
+        self._last_put = {}
+        self._in_flight = {}
+        self._request_stats = {"requests": 0, "coalesced": 0, "active": 0}
         self._host = host
         self._websession = websession
-        self._request_timeout = 10
+        self._own_session = websession is None
+        self._pool_options = {
+            "limit_per_host": limit_per_host,
+            "keepalive_timeout": keepalive_timeout,
+        }
+        self._connection_stats = {
+            "handshakes": 0,
+            "reused": 0,
+            "dns_hits": 0,
+            "dns_misses": 0,
+        }
+        self._request_timeout = TIMEOUT
+        self._adaptive_timeout = adaptive_timeout
+        self._latency = LatencyTracker(timeout_floor, TIMEOUT)
+        self._retry = RetryPolicy(retry_attempts)
+        self._breaker = CircuitBreaker(breaker_threshold, breaker_reset)
         self._encryption = encryption
+        self._executor = None
+        self._own_executor = False
+        self._offload_threshold = offload_threshold
+        self._decode_stats = {
+            "inline": 0,
+            "offloaded": 0,
+            "inline_time": 0.0,
+            "max_inline_time": 0.0,
+        }
+        self._decode_cache = LRUCache(decode_cache_size, decode_cache_bytes)
+        self._put_cache = LRUCache(put_cache_size)
+        self._put_cache_prewarm = put_cache_prewarm
+        self._negative_cache = LRUCache(
+            NEGATIVE_CACHE_SIZE if negative_cache_ttl else 0
+        )
+        self._negative_cache_ttl = negative_cache_ttl
+        self._response_cache = ResponseCache(RESPONSE_CACHE_SIZE, response_cache)
+        # (fetched at, response) of GETs asked with max_age
+        self._recent_cache = LRUCache(RECENT_CACHE_SIZE)
+        self._put_generation = {}
+        self._limiter = limiter
+        self.set_executor(executor)
 
     @property
     def encryption_key(self):
         return self._encryption.key
 
+    @property
+    def aes_backend(self):
+        """Return name of AES backend used by encryption."""
+        return self._encryption.backend
+
+    @property
+    def decode_stats(self):
+        """
+        Return statistics of response decoding.
+
+        inline_time and max_inline_time are seconds event loop was blocked
+        by decrypting and parsing responses.
+        """
+        return dict(self._decode_stats)
+
+    @property
+    def max_in_flight(self):
+        """Return maximum number of concurrent requests."""
+        return self._queue.max_in_flight
+
+    def set_max_in_flight(self, max_in_flight):
+        """Change concurrency limit, requests already running are not affected."""
+        self._queue.max_in_flight = max_in_flight
+
+    @property
+    def priorities(self):
+        """Return priority class name -> rank mapping."""
+        return dict(self._priorities)
+
+    def _rank(self, priority, group, default):
+        """Resolve priority class of request to queue rank."""
+        if priority is None:
+            priority = default
+            if default == BACKGROUND and (
+                time.monotonic() - self._last_put.get(group, float("-inf"))
+                < self._followup_window
+            ):
+                priority = FOLLOWUP
+        if priority not in self._priorities:
+            raise ValueError(f"Unknown priority {priority}")
+        return self._priorities[priority]
+
+    @staticmethod
+    def _group(path):
+        """Group requests by circuit, e.g. /heatingCircuits/hc1."""
+        return "/".join(path.split("/", 3)[:3])
+
+    @property
+    def request_stats(self):
+        """
+        Return request counters.
+
+        requests are sent to gateway, coalesced are GETs which shared
+        response of identical request already in flight.
+        """
+        return dict(self._request_stats)
+
+    @property
+    def cache_stats(self):
+        """Return statistics of connector caches."""
+        return {
+            "decode": self._decode_cache.stats,
+            "put": self._put_cache.stats,
+            "negative": self._negative_cache.stats,
+            "response": self._response_cache.stats,
+            "recent": self._recent_cache.stats,
+        }
+
+    def configure_response_cache(self, config):
+        """
+        Set TTL classes of cached GET responses.
+
+        :param dict config: {"ttl": {class: seconds or None},
+            "uris": {class: [path or wildcard pattern]}}
+        """
+        self._response_cache.configure(config if config else {})
+
+    def invalidate_response_cache(self, path=None):
+        """Drop cached response of path, everything if path is None."""
+        self._response_cache.invalidate(path)
+
+    def invalidate_negative_cache(self, path=None):
+        """Forget URIs known as missing, all of them if path is None."""
+        if path is None:
+            self._negative_cache.clear()
+        else:
+            self._negative_cache.pop(path)
+
+    def _known_missing(self, path):
+        """Check if path answered 404/405 recently."""
+        if not self._negative_cache.enabled:
+            return False
+        expires = self._negative_cache.get(path)
+        if expires is None:
+            return False
+        if expires > time.monotonic():
+            return True
+        self._negative_cache.pop(path)
+        return False
+
+    def _put_body(self, value, warm=False, field="value"):
+        """
+        Return encrypted PUT body for value.
+
+        ECB encryption is deterministic, so bodies of hashable values are
+        cached. Type is part of key as 1, 1.0 and True encode differently.
+        """
+        if field != "value":
+            return self._encryption.encrypt(json.dumps({field: value}))
+        try:
+            key = (type(value), value)
+            hash(key)
+        except TypeError:
+            return self._encryption.encrypt(json.dumps({"value": value}))
+        if warm and key in self._put_cache:
+            return None
+        body = None if warm else self._put_cache.get(key)
+        if body is None:
+            body = self._encryption.encrypt(json.dumps({"value": value}))
+            self._put_cache.set(key, body, len(body))
+        return body
+
+    def warm_put_cache(self, values):
+        """Encrypt values which are likely to be sent soon."""
+        if not self._put_cache_prewarm or not self._put_cache.enabled:
+            return
+        for value in values:
+            self._put_body(value, warm=True)
+
+    def set_executor(self, executor, offload_threshold=None):
+        """Set executor used to decode responses bigger than threshold."""
+        if self._own_executor:
+            self._executor.shutdown(wait=False)
+        self._own_executor = executor in (THREAD, PROCESS)
+        if executor == THREAD:
+            executor = ThreadPoolExecutor(max_workers=1)
+        elif executor == PROCESS:
+            executor = ProcessPoolExecutor(max_workers=1)
+        elif executor is not None and not isinstance(executor, Executor):
+            raise ValueError(f"Unknown executor {executor}")
+        self._executor = executor
+        if offload_threshold is not None:
+            self._offload_threshold = offload_threshold
+
+    @property
+    def connection_stats(self):
+        """
+        Return new vs reused connection counters of owned pool.
+
+        None if session was passed from outside and can't be traced.
+        """
+        if not self._own_session:
+            return None
+        return dict(self._connection_stats)
+
+    def _count(self, name):
+        async def counter(session, context, params):
+            self._connection_stats[name] += 1
+
+        return counter
+
+    @property
+    def websession(self):
+        """Return session, creating owned one on first use."""
+        if self._websession is None:
+            trace = TraceConfig()
+            trace.on_connection_create_end.append(self._count("handshakes"))
+            trace.on_connection_reuseconn.append(self._count("reused"))
+            trace.on_dns_cache_hit.append(self._count("dns_hits"))
+            trace.on_dns_cache_miss.append(self._count("dns_misses"))
+            limit = self._pool_options["limit_per_host"] or self.max_in_flight
+            connector = TCPConnector(
+                limit=limit,
+                limit_per_host=limit,
+                keepalive_timeout=self._pool_options["keepalive_timeout"],
+                use_dns_cache=True,
+                ttl_dns_cache=None,
+            )
+            self._websession = ClientSession(
+                connector=connector, trace_configs=[trace]
+            )
+        return self._websession
+
+    async def close(self):
+        """Release executor and session created by connector."""
+        self.set_executor(None)
+        if self._own_session and self._websession is not None:
+            await self._websession.close()
+            self._websession = None
+
+    async def _decode(self, raw):
+        """
+        Decrypt and parse response.
+
+        Gateway sends byte identical bodies for unchanged values, so decoded
+        objects are remembered by body digest and copies are returned.
+        """
+        if not raw.strip():
+            return None
+        if not self._decode_cache.enabled:
+            return await self._decrypt_and_parse(raw)
+        digest = body_digest(raw)
+        data = self._decode_cache.get(digest)
+        if data is None:
+            data = await self._decrypt_and_parse(raw)
+            self._decode_cache.set(digest, data, len(raw) + json_size(data))
+        return copy_json(data)
+
+    async def _decrypt_and_parse(self, raw):
+        """Decrypt and parse response, offloading big ones to executor."""
+        if self._executor and len(raw) >= self._offload_threshold:
+            self._decode_stats["offloaded"] += 1
+            loop = asyncio.get_event_loop()
+            if isinstance(self._executor, ProcessPoolExecutor):
+                return await loop.run_in_executor(
+                    self._executor,
+                    decode_response,
+                    self._encryption.key,
+                    self._encryption.backend,
+                    raw,
+                )
+            return await loop.run_in_executor(
+                self._executor, self._encryption.json_encrypt, raw
+            )
+        start = time.perf_counter()
+        try:
+            return self._encryption.json_encrypt(raw)
+        finally:
+            elapsed = time.perf_counter() - start
+            self._decode_stats["inline"] += 1
+            self._decode_stats["inline_time"] += elapsed
+            if elapsed > self._decode_stats["max_inline_time"]:
+                self._decode_stats["max_inline_time"] = elapsed
+
     async def _request(self, method, path, **kwargs):
         _LOGGER.debug("Sending %s request to %s", method.__name__.upper(), path)
-        
+
         async def get_response(method_name, res):
             if method_name == "put":
                 data = await res.text()
@@ -44,51 +425,213 @@ class HttpConnector:
                 and res.status == 200
                 and res.content_type == APP_JSON
             ):
-                data = await res.json(loads=self._encryption.json_encrypt)
-                return data
+                return await self._decode(await res.read())
             raise ResponseException(res)
 
+        start = time.monotonic()
         try:
             async with method(self._format_url(path), **kwargs) as res:
-                return await get_response(method.__name__, res)
+                response = await get_response(method.__name__, res)
+                self._latency.add(path, time.monotonic() - start)
+                return response
         except ClientResponseError as err:
+            if err.status >= 500:
+                raise ConnectionException(f"Gateway error for {path}: {err}")
+            # only URI missing on gateway, auth errors may be temporary
+            if method.__name__ == "get" and err.status in (404, 405):
+                self._negative_cache.set(
+                    path, time.monotonic() + self._negative_cache_ttl
+                )
             raise DeviceException(f"URI {path} doesn not exist: {err}")
+        except ServerTimeoutError:
+            # also ConnectionTimeoutError, before ClientError swallows them
+            self._latency.backoff(path)
+            raise ConnectionException(f"Connection timed out for {path}.")
         except ClientConnectorError as err:
-            raise DeviceException(err)
+            raise ConnectionException(err)
         except ResponseException as err:
             raise DeviceException(f"Error requesting data from {path}: {err}")
         except ClientError as err:
-            raise DeviceException(f"Error connecting to client {path}: {err}")
+            raise ConnectionException(f"Error connecting to client {path}: {err}")
         except AsyncTimeout:
-            raise DeviceException(f"Connection timed out for {path}.")
+            self._latency.backoff(path)
+            raise ConnectionException(f"Connection timed out for {path}.")
 
     def _format_url(self, path):
         """Format URL to make requests to gateway."""
         return f"http://{self._host}{path}"
 
-    def set_timeout(self, timeout=10):
-        """Set timeout for API calls."""
+    def set_timeout(self, timeout=TIMEOUT, floor=None):
+        """
+        Set timeout for API calls.
+
+        With adaptive timeout it is the ceiling, floor is lowest timeout.
+        """
         self._request_timeout = timeout
+        self._latency.ceiling = timeout
+        if floor is not None:
+            self._latency.floor = floor
 
-    async def get(self, path):
-        """Get message from API with given path."""
-        async with self._lock:
-            return await self._request(
-                self._websession.get,
-                path,
-                headers=HTTP_HEADER,
-                timeout=self._request_timeout,
-                skip_auto_headers=["Accept-Encoding", "Accept"],
-                raise_for_status=True,
-            )
+    def set_adaptive_timeout(self, enabled):
+        """Enable or disable timeouts derived from observed latency."""
+        self._adaptive_timeout = enabled
+
+    def _timeout(self, path):
+        """Return timeout for request of path."""
+        if self._adaptive_timeout:
+            return self._latency.timeout(path)
+        return self._request_timeout
+
+    @property
+    def timeouts(self):
+        """Return learned latency estimates and timeout of each URI."""
+        return self._latency.estimates
+
+    async def get(self, path, priority=None, max_age=None):
+        """
+        Get message from API with given path.
+
+        If the same path is already requested, wait for that response
+        instead of sending another request.
+
+        :param str priority: priority class. By default background, or
+            followup shortly after PUT to the same circuit.
+        :param float max_age: accept response of other GET with max_age
+            fetched at most max_age seconds ago, so callers reading the same
+            URI in one refresh share single request.
+        """
+        if self._known_missing(path):
+            raise DeviceException(f"URI {path} doesn not exist (cached).")
+        cached = self._response_cache.get(path)
+        if cached is not None:
+            return copy_json(cached)
+        if max_age is None:
+            return await self._get_shared(path, priority)
+        recent = self._recent_cache.get(path)
+        if recent is not None and time.monotonic() - recent[0] <= max_age:
+            return copy_json(recent[1])
+        generation = self._put_generation.get(path, 0)
+        result = await self._get_shared(path, priority)
+        if result is not None and generation == self._put_generation.get(path, 0):
+            self._recent_cache.set(path, (time.monotonic(), copy_json(result)))
+        return result
+
+    async def _get_shared(self, path, priority):
+        """
+        Send GET or join the one already in flight.
+
+        GET sent before PUT to the same path is not joined, its response
+        may predate the write.
+        """
+        group = self._group(path)
+        rank = self._rank(priority, group, BACKGROUND)
+        generation = self._put_generation.get(path, 0)
+        flight = self._in_flight.get(path)
+        if flight and flight[3] == generation:
+            self._request_stats["coalesced"] += 1
+            flight[2] += 1
+            self._queue.promote(flight[1], rank)
+            return copy_json(await asyncio.shield(flight[0]))
+        ticket = self._queue.ticket(rank, group)
+        task = asyncio.ensure_future(self._get(path, ticket))
+        # [request task, queue ticket, number of coalesced followers, put generation]
+        flight = self._in_flight[path] = [task, ticket, 0, generation]
+
+        def done(_):
+            if self._in_flight.get(path) is flight:
+                del self._in_flight[path]
+
+        task.add_done_callback(done)
+        result = await asyncio.shield(task)
+        return copy_json(result) if flight[2] else result
+
+    @property
+    def breaker_stats(self):
+        """Return circuit breaker state and counters."""
+        return self._breaker.stats
+
+    async def _send(self, ticket, method, path, **kwargs):
+        """Send request retrying connection failures unless breaker is open."""
+        attempt = 0
+        while True:
+            if not self._breaker.allow():
+                raise ConnectionException(
+                    f"Gateway {self._host} unavailable, not requesting {path}."
+                )
+            try:
+                result = await self._limited(ticket, method, path, **kwargs)
+            except ConnectionException:
+                self._breaker.failure()
+                attempt += 1
+                if attempt >= self._retry.attempts:
+                    raise
+                await asyncio.sleep(self._retry.delay(attempt - 1))
+                continue
+            except BoschException:
+                self._breaker.success()
+                raise
+            except BaseException:
+                self._breaker.abort()
+                raise
+            self._breaker.success()
+            return result
 
-    async def put(self, path, value):
-        """Send message to API with given path."""
-        async with self._lock:
-            return await self._request(
-                self._websession.put,
+    async def _limited(self, ticket, method, path, **kwargs):
+        """Send request when queue, and shared limiter if any, grant it slot."""
+        await self._queue.acquire(ticket)
+        try:
+            if self._limiter is None:
+                return await self._counted(method, path, **kwargs)
+            await self._limiter.acquire(self._limiter.ticket(ticket.rank, self._host))
+            try:
+                return await self._counted(method, path, **kwargs)
+            finally:
+                self._limiter.release()
+        finally:
+            self._queue.release()
+
+    async def _counted(self, method, path, **kwargs):
+        kwargs["timeout"] = self._timeout(path)
+        self._request_stats["requests"] += 1
+        self._request_stats["active"] += 1
+        try:
+            return await self._request(method, path, **kwargs)
+        finally:
+            self._request_stats["active"] -= 1
+
+    async def _get(self, path, ticket):
+        """Get message from API with given path and cache response."""
+        generation = self._put_generation.get(path, 0)
+        result = await self._send(
+            ticket,
+            self.websession.get,
+            path,
+            headers=HTTP_HEADER,
+            skip_auto_headers=["Accept-Encoding", "Accept"],
+            raise_for_status=True,
+        )
+        if result is not None and generation == self._put_generation.get(path, 0):
+            self._response_cache.set(path, copy_json(result))
+        return result
+
+    async def put(self, path, value, priority=INTERACTIVE, field="value"):
+        """
+        Send message to API with given path.
+
+        :param str field: body key of value, e.g. switchPoints of program.
+        """
+        group = self._group(path)
+        ticket = self._queue.ticket(self._rank(priority, group, INTERACTIVE), group)
+        self._last_put[group] = time.monotonic()
+        self._put_generation[path] = self._put_generation.get(path, 0) + 1
+        try:
+            return await self._send(
+                ticket,
+                self.websession.put,
                 path,
-                data=self._encryption.encrypt(json.dumps({"value": value})),
+                data=self._put_body(value, field=field),
                 headers=HTTP_HEADER,
-                timeout=self._request_timeout,
             )
+        finally:
+            self._response_cache.invalidate(path)
+            self._recent_cache.pop(path)
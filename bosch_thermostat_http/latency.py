@@ -0,0 +1,102 @@
+"""Latency estimates used to derive request timeouts."""
+import re
+
+DIGITS = re.compile(r"\d+")
+
+
+def uri_class(path):
+    """Group URIs differing only by circuit number, e.g. /heatingCircuits/hc#/status."""
+    return DIGITS.sub("#", path)
+
+
+class LatencyEstimate:
+    """Smoothed latency and its variation, same way TCP estimates RTT."""
+
+    __slots__ = ("srtt", "rttvar", "samples", "timeouts")
+
+    def __init__(self):
+        self.srtt = None
+        self.rttvar = None
+        self.samples = 0
+        self.timeouts = 0
+
+    def add(self, latency, alpha, beta):
+        """Add successful request latency."""
+        if self.srtt is None:
+            self.srtt = latency
+            self.rttvar = latency / 2
+        else:
+            self.rttvar = (1 - beta) * self.rttvar + beta * abs(self.srtt - latency)
+            self.srtt = (1 - alpha) * self.srtt + alpha * latency
+        self.samples += 1
+
+    def backoff(self):
+        """Request timed out, widen variation so next timeout is longer."""
+        self.timeouts += 1
+        if self.rttvar is not None:
+            self.rttvar *= 2
+
+
+class LatencyTracker:
+    """
+    Track latency per URI and per URI class.
+
+    Timeout is srtt + k * rttvar clamped to floor and ceiling. Until URI has
+    enough samples its class estimate is used, ceiling if none of them has.
+    """
+
+    def __init__(self, floor, ceiling, min_samples=5, k=4, alpha=0.125, beta=0.25):
+        self.floor = floor
+        self.ceiling = ceiling
+        self._min_samples = min_samples
+        self._k = k
+        self._alpha = alpha
+        self._beta = beta
+        self._uris = {}
+        self._classes = {}
+
+    def _estimates(self, path):
+        uri = self._uris.get(path)
+        if uri is None:
+            uri = self._uris[path] = LatencyEstimate()
+        klass = self._classes.get(uri_class(path))
+        if klass is None:
+            klass = self._classes[uri_class(path)] = LatencyEstimate()
+        return uri, klass
+
+    def add(self, path, latency):
+        """Record latency of successful request."""
+        for estimate in self._estimates(path):
+            estimate.add(latency, self._alpha, self._beta)
+
+    def backoff(self, path):
+        """Record timed out request."""
+        for estimate in self._estimates(path):
+            estimate.backoff()
+
+    def _timeout(self, estimate):
+        if estimate is None or estimate.samples < self._min_samples:
+            return None
+        timeout = estimate.srtt + self._k * estimate.rttvar
+        return min(max(timeout, self.floor), self.ceiling)
+
+    def timeout(self, path):
+        """Return timeout for next request of path."""
+        timeout = self._timeout(self._uris.get(path))
+        if timeout is None:
+            timeout = self._timeout(self._classes.get(uri_class(path)))
+        return timeout if timeout is not None else self.ceiling
+
+    @property
+    def estimates(self):
+        """Return learned latency and timeout of each URI."""
+        return {
+            path: {
+                "srtt": estimate.srtt,
+                "rttvar": estimate.rttvar,
+                "samples": estimate.samples,
+                "timeouts": estimate.timeouts,
+                "timeout": self.timeout(path),
+            }
+            for path, estimate in self._uris.items()
+        }
@@ -0,0 +1,113 @@
+"""Priority aware limiter of requests sent to gateway."""
+import asyncio
+from collections import OrderedDict, deque
+
+
+class Ticket:
+    """Place of single request in queue."""
+
+    __slots__ = ("rank", "group", "future")
+
+    def __init__(self, rank, group):
+        self.rank = rank
+        self.group = group
+        self.future = None
+
+
+class RequestQueue:
+    """
+    Grant request slots by priority rank, lower rank goes first.
+
+    Requests with the same rank are served round robin across groups
+    (e.g. circuits), so one busy circuit does not starve the others.
+    """
+
+    def __init__(self, max_in_flight=1):
+        """:param int max_in_flight: number of requests allowed at once."""
+        self._max_in_flight = max_in_flight
+        self._active = 0
+        self._waiting = {}
+
+    @property
+    def max_in_flight(self):
+        """Return number of requests allowed at once."""
+        return self._max_in_flight
+
+    @max_in_flight.setter
+    def max_in_flight(self, value):
+        self._max_in_flight = value
+        self._dispatch()
+
+    @property
+    def waiting(self):
+        """Return number of requests waiting for slot."""
+        return sum(
+            len(tickets) for groups in self._waiting.values() for tickets in groups.values()
+        )
+
+    def ticket(self, rank, group=None):
+        """Create ticket to acquire slot with."""
+        return Ticket(rank, group)
+
+    async def acquire(self, ticket):
+        """Wait until ticket is granted request slot."""
+        if self._active < self._max_in_flight and not self._waiting:
+            self._active += 1
+            return
+        ticket.future = asyncio.get_event_loop().create_future()
+        self._enqueue(ticket)
+        try:
+            await ticket.future
+        except asyncio.CancelledError:
+            if ticket.future.done() and not ticket.future.cancelled():
+                self.release()
+            else:
+                self._remove(ticket)
+            raise
+
+    def release(self):
+        """Free request slot and pass it to next waiting ticket."""
+        self._active -= 1
+        self._dispatch()
+
+    def promote(self, ticket, rank):
+        """Move waiting ticket to better rank."""
+        if rank >= ticket.rank:
+            return
+        if ticket.future is None or ticket.future.done():
+            ticket.rank = rank
+            return
+        self._remove(ticket)
+        ticket.rank = rank
+        self._enqueue(ticket)
+
+    def _enqueue(self, ticket):
+        groups = self._waiting.setdefault(ticket.rank, OrderedDict())
+        groups.setdefault(ticket.group, deque()).append(ticket)
+
+    def _remove(self, ticket):
+        groups = self._waiting.get(ticket.rank, {})
+        tickets = groups.get(ticket.group)
+        if tickets and ticket in tickets:
+            tickets.remove(ticket)
+            if not tickets:
+                del groups[ticket.group]
+            if not groups:
+                del self._waiting[ticket.rank]
+
+    def _dispatch(self):
+        while self._active < self._max_in_flight and self._waiting:
+            rank = min(self._waiting)
+            groups = self._waiting[rank]
+            group, tickets = next(iter(groups.items()))
+            ticket = tickets.popleft()
+            if tickets:
+                groups.move_to_end(group)
+            else:
+                del groups[group]
+            if not groups:
+                del self._waiting[rank]
+            if ticket.future.done():
+                continue
+            self._active += 1
+            ticket.future.set_result(None)
@@ -0,0 +1,84 @@
+"""Retry policy and circuit breaker protecting gateway from piled up requests."""
+import random
+import time
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class RetryPolicy:
+    """Bounded retries with full jitter exponential backoff."""
+
+    def __init__(self, attempts=2, base_delay=0.5, max_delay=5):
+        """:param int attempts: tries in total, 1 disables retries."""
+        self.attempts = attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delay(self, attempt):
+        """Return seconds to wait before next try after failed attempt."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+
+class CircuitBreaker:
+    """
+    Fail fast when gateway stopped responding.
+
+    Opens after threshold consecutive failures. After reset_timeout single
+    probe request is let through, its result closes or reopens breaker.
+    """
+
+    def __init__(self, threshold=5, reset_timeout=30):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+        self._rejected = 0
+
+    @property
+    def state(self):
+        """Return closed, open or half_open."""
+        if self._opened_at is None:
+            return CLOSED
+        if self._probing or time.monotonic() - self._opened_at >= self.reset_timeout:
+            return HALF_OPEN
+        return OPEN
+
+    def allow(self):
+        """Check if request may be sent, half open lets single probe through."""
+        state = self.state
+        if state == CLOSED:
+            return True
+        if state == HALF_OPEN and not self._probing:
+            self._probing = True
+            return True
+        self._rejected += 1
+        return False
+
+    def success(self):
+        """Gateway answered."""
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+
+    def failure(self):
+        """Gateway didn't answer."""
+        self._failures += 1
+        if self._probing or self._failures >= self.threshold:
+            self._opened_at = time.monotonic()
+        self._probing = False
+
+    def abort(self):
+        """Request was cancelled before result, let another probe through."""
+        self._probing = False
+
+    @property
+    def stats(self):
+        """Return breaker state and counters."""
+        return {
+            "state": self.state,
+            "consecutive_failures": self._failures,
+            "rejected": self._rejected,
+        }
@@ -1,5 +1,8 @@
 """Logic to converse schedule."""
+import asyncio
 import logging
+from array import array
+from bisect import bisect_right
 from datetime import datetime
 
 from .const import (
@@ -23,17 +26,83 @@ from .const import (
     CAN,
     URI,
     ACTIVE_PROGRAM,
+    STATE,
+    DATE_FORMAT,
+    MIDNIGHT,
+    TIMELINE_RESOLUTION,
+    FORECAST_HOURS,
+    SETPOINT_MAX_AGE,
+    MAX_SWITCH_POINTS_PER_DAY,
+    SWITCH_POINT_RASTER,
 )
+from .cache import copy_json
+from .clock import GatewayClock
 from .exceptions import DeviceException
 
+try:
+    import numpy
+except ImportError:  # pragma: no cover - optional dependency
+    numpy = None
+
 _LOGGER = logging.getLogger(__name__)
 
+WEEK = 7 * MIDNIGHT
+
 
 def sort_switchpoints(dic):
     day = dic[DAYOFWEEK]
     return (DAYS_INT.index(day), dic[TIME])
 
 
+def week_minute(date):
+    """Minutes since Monday midnight."""
+    return date.weekday() * MIDNIGHT + date.hour * 60 + date.minute
+
+
+def timeline_slots(resolution):
+    """Return number of slots in week timeline."""
+    if resolution <= 0 or WEEK % resolution:
+        raise ValueError(f"Resolution {resolution} doesn't divide week")
+    return WEEK // resolution
+
+
+def constant_timeline(value, resolution=TIMELINE_RESOLUTION):
+    """Return week timeline with same temperature in every slot."""
+    slots = timeline_slots(resolution)
+    if numpy is not None:
+        return numpy.full(slots, value, dtype=numpy.float32)
+    return array("f", [value]) * slots
+
+
+def forecast_window(timeline, start, length):
+    """Return length slots of week timeline from slot start, wrapping at week end."""
+    slots = len(timeline)
+    if not slots:
+        return timeline[:0]
+    if numpy is not None:
+        return numpy.take(timeline, numpy.arange(start, start + length) % slots)
+    return array("f", (timeline[(start + index) % slots] for index in range(length)))
+
+
+def stack_forecasts(timelines, starts, length):
+    """
+    Return forecast of many timelines at once.
+
+    With numpy it is single 2D gather of shape (len(timelines), length),
+    list of arrays otherwise.
+    """
+    if numpy is None or not len(timelines):
+        return [
+            forecast_window(timeline, start, length)
+            for timeline, start in zip(timelines, starts)
+        ]
+    matrix = numpy.vstack(timelines)
+    columns = (
+        numpy.asarray(starts)[:, None] + numpy.arange(length)[None, :]
+    ) % matrix.shape[1]
+    return numpy.take_along_axis(matrix, columns, axis=1)
+
+
 class Schedule:
     """Scheduler logic."""
 
@@ -55,15 +124,48 @@ class Schedule:
         self._circuit_name = circuit_name
         self._setpoints_temp = {}
         self._switch_points = None
+        # setpointProperty and limits of active program
+        self._program = {}
         self._active_setpoint = None
         self._active_program_uri = None
         self._time = None
         self._time_retrieve = current_time
+        self._clock = current_time if isinstance(current_time, GatewayClock) else None
         self._str_obj = str_obj
         self._bus_type = bus_type
         self._db = db
         self._op_mode = op_mode
         self._schedule_found = False
+        self._boundaries = []
+        self._boundary_setpoints = []
+        self._parsed_time = (None, None)
+        self._memo = None
+        self._timelines = {}
+
+    def _compile(self):
+        """
+        Index switch points by minute of week for bisect lookup.
+
+        Lookup result is memoized as (start, end, result) until next
+        switch point, end may pass end of week.
+        """
+        points = sorted(self._switch_points or [], key=sort_switchpoints)
+        self._boundaries = [
+            DAYS_INT.index(point[DAYOFWEEK]) * MIDNIGHT + point[TIME] for point in points
+        ]
+        self._boundary_setpoints = [point[SETPOINT] for point in points]
+        self._memo = None
+        self._timelines = {}
+
+    def _now(self):
+        """Return gateway time as datetime."""
+        if self._clock and self._clock.synced:
+            return self._clock.datetime()
+        if not self._time:
+            return None
+        if self._parsed_time[0] != self._time:
+            self._parsed_time = (self._time, datetime.strptime(self._time, DATE_FORMAT))
+        return self._parsed_time[1]
 
     async def update_schedule(self, active_program):
         """Update schedule from Bosch gateway."""
@@ -72,8 +174,16 @@ class Schedule:
             self._circuit_name, active_program
         )
         try:
-            self._time = await self._time_retrieve()
+            if self._clock:
+                self._time = await self._clock.now()
+            else:
+                self._time = await self._time_retrieve()
             result = await self._connector.get(self._active_program_uri)
+            self._program = {
+                key: result[key]
+                for key in (SETPOINT_PROP, MAX_SWITCH_POINTS_PER_DAY, SWITCH_POINT_RASTER)
+                if key in result
+            }
             await self._parse_schedule(
                 result.get(SWITCH_POINTS), result.get(SETPOINT_PROP)
             )
@@ -86,10 +196,130 @@ class Schedule:
             )
             pass
 
+    def snapshot(self):
+        """Return active program with its switch points and setpoints."""
+        return {
+            ACTIVE_PROGRAM: self._active_program,
+            SWITCH_POINTS: copy_json(self._switch_points),
+            SETPOINT: copy_json(self._setpoints_temp),
+            STATE: self._schedule_found,
+            SWITCHPROGRAM: copy_json(self._program),
+        }
+
+    def restore(self, snapshot, time=None):
+        """Restore schedule saved by snapshot."""
+        active_program = snapshot.get(ACTIVE_PROGRAM)
+        if not active_program:
+            return
+        self._active_program = active_program
+        self._active_program_uri = self._db[SWITCHPROGRAM].format(
+            self._circuit_name, active_program
+        )
+        self._switch_points = copy_json(snapshot.get(SWITCH_POINTS))
+        self._setpoints_temp = copy_json(snapshot.get(SETPOINT, {}))
+        self._schedule_found = snapshot.get(STATE, False)
+        self._program = copy_json(snapshot.get(SWITCHPROGRAM, {}))
+        self._time = time
+        self._compile()
+
     async def update_schedule_test(self, result, time):
         """Test function to do. Update schedule from Bosch gateway."""
         self._time = time
         self._switch_points = result.get(SWITCH_POINTS)
+        self._compile()
+
+    def edit(self):
+        """
+        Return batch of switch point edits of active program.
+
+        Upload it with commit() or use it as async context manager.
+        """
+        return SwitchProgramEdit(self)
+
+    def _invalid_switch_points(self, switch_points):
+        """Return reason why gateway would refuse switch points, None if valid."""
+        raster = self._program.get(SWITCH_POINT_RASTER)
+        per_day = self._program.get(MAX_SWITCH_POINTS_PER_DAY)
+        days = {}
+        for point in switch_points:
+            if point[DAYOFWEEK] not in DAYS_INT:
+                return f"unknown day {point[DAYOFWEEK]}"
+            if not 0 <= point[TIME] < MIDNIGHT or (raster and point[TIME] % raster):
+                return f"time {point[TIME]} is out of range or raster {raster}"
+            days.setdefault(point[DAYOFWEEK], set()).add(point[TIME])
+        if len(switch_points) != sum(len(times) for times in days.values()):
+            return "more switch points at the same time"
+        if per_day and any(len(times) > per_day for times in days.values()):
+            return f"more than {per_day} switch points per day"
+        return None
+
+    async def set_switch_points(self, switch_points):
+        """
+        Upload switch points of active program in single PUT.
+
+        Nothing is sent if they equal cached ones. Temperatures of new
+        setpoints are fetched first and points are refused if any of them
+        doesn't exist. Local index is updated from uploaded points.
+        Return True if uploaded.
+        """
+        if not self._schedule_found:
+            _LOGGER.warning("Active program of %s is unknown", self._circuit_name)
+            return False
+        points = sorted(
+            (
+                {DAYOFWEEK: point[DAYOFWEEK], SETPOINT: point[SETPOINT], TIME: point[TIME]}
+                for point in switch_points
+            ),
+            key=sort_switchpoints,
+        )
+        invalid = self._invalid_switch_points(points)
+        if invalid:
+            _LOGGER.warning(
+                "Not uploading program %s of %s: %s",
+                self._active_program,
+                self._circuit_name,
+                invalid,
+            )
+            return False
+        if points == sorted(self._switch_points or [], key=sort_switchpoints):
+            _LOGGER.debug("Program %s is unchanged", self._active_program)
+            return False
+        setpoints = list(
+            dict.fromkeys(
+                point[SETPOINT]
+                for point in points
+                if point[SETPOINT] not in self._setpoints_temp
+            )
+        )
+        try:
+            if setpoints and not self._program.get(SETPOINT_PROP):
+                raise DeviceException(f"unknown setpoints {setpoints}")
+            temps = await asyncio.gather(
+                *(
+                    self._get_setpoint_temp(
+                        self._program[SETPOINT_PROP], setpoint, strict=True
+                    )
+                    for setpoint in setpoints
+                )
+            )
+        except DeviceException as err:
+            _LOGGER.warning(
+                "Not uploading program %s of %s: %s",
+                self._active_program,
+                self._circuit_name,
+                err,
+            )
+            return False
+        await self._connector.put(self._active_program_uri, points, field=SWITCH_POINTS)
+        self._setpoints_temp.update(zip(setpoints, temps))
+        self._switch_points = points
+        self._compile()
+        return True
+
+    @property
+    def switch_points(self):
+        """Return copy of switch points of active program."""
+        return copy_json(self._switch_points or [])
 
     @property
     def setpoints(self):
@@ -98,7 +328,9 @@ class Schedule:
 
     @property
     def time(self):
-        """Get current time of Gateway."""
+        """Get current time of Gateway, advanced by clock model between updates."""
+        if self._clock and self._clock.synced:
+            return self._clock.time
         return self._time
 
     @property
@@ -113,26 +345,41 @@ class Schedule:
             active_setpoint = self.get_temp_in_schedule()[MODE]
         if active_setpoint in self._setpoints_temp:
             self._setpoints_temp[active_setpoint][VALUE] = temp
+            self._memo = None
+            self._timelines = {}
 
-    async def _get_setpoint_temp(self, setpoint_property, setpoint):
-        """Download temp for setpoint."""
+    async def _get_setpoint_temp(self, setpoint_property, setpoint, strict=False):
+        """
+        Download temp for setpoint.
+
+        Setpoint which can't be fetched gets zero temperatures, strict
+        raises DeviceException instead.
+        """
+        result = None
         try:
             uri = f"{setpoint_property[ID]}/{setpoint}"
-            result = await self._connector.get(uri)
+            result = await self._connector.get(uri, max_age=SETPOINT_MAX_AGE)
             if self._bus_type == CAN and result.get(VALUE, 0) == 1:
                 uri = f"/{self._circuit_type}/{self._circuit_name}/currentSetpoint"
-                result = await self._connector.get(uri)
+                result = await self._connector.get(uri, max_age=SETPOINT_MAX_AGE)
         except DeviceException as err:
             _LOGGER.debug("Bug %s", err)
             if setpoint == ON and self._bus_type != CAN:
                 setpoint = "high"
                 try:
                     result = await self._connector.get(
-                        f"{setpoint_property[ID]}/{setpoint}"
+                        f"{setpoint_property[ID]}/{setpoint}",
+                        max_age=SETPOINT_MAX_AGE,
                     )
                 except DeviceException:
                     pass
-            pass
+        if result is None:
+            if strict:
+                raise DeviceException(
+                    f"Setpoint {setpoint} of {self._circuit_name} doesn't exist"
+                )
+            _LOGGER.debug("No temperature of setpoint %s", setpoint)
+            result = {}
         return {
             MODE: setpoint,
             VALUE: result.get(VALUE, 0),
@@ -142,14 +389,28 @@ class Schedule:
         }
 
     async def _parse_schedule(self, switch_points, setpoint_property):
-        """Convert Bosch schedule to dict format."""
-        for switch in switch_points:
-            setpoint = switch[SETPOINT]
-            if setpoint not in self._setpoints_temp:
-                self._setpoints_temp[setpoint] = await self._get_setpoint_temp(
-                    setpoint_property, setpoint
-                )
+        """
+        Convert Bosch schedule to dict format.
+
+        New setpoints are fetched concurrently, schedules of other circuits
+        with the same setpointProperty reuse responses through max_age.
+        """
+        setpoints = list(
+            dict.fromkeys(
+                switch[SETPOINT]
+                for switch in switch_points
+                if switch[SETPOINT] not in self._setpoints_temp
+            )
+        )
+        results = await asyncio.gather(
+            *(
+                self._get_setpoint_temp(setpoint_property, setpoint)
+                for setpoint in setpoints
+            )
+        )
+        self._setpoints_temp.update(zip(setpoints, results))
         self._switch_points = switch_points
+        self._compile()
 
     def get_temp_for_current_mode(self):
         """This is working only in manual for RC35 where op_mode == setpoint."""
@@ -161,8 +422,7 @@ class Schedule:
             )
         if not self._schedule_found:
             return ACTIVE_PROGRAM
-        if self.time:
-            cache = self.get_temp_in_schedule()
+        cache = self.get_temp_in_schedule()
         return cache.get(TEMP, 0)
 
     def get_max_temp_for_mode(self, extra_val=False):
@@ -183,8 +443,7 @@ class Schedule:
             )
         if not self._schedule_found:
             return ACTIVE_PROGRAM
-        if self.time:
-            cache = self.get_temp_in_schedule()
+        cache = self.get_temp_in_schedule()
         if (
             min_max == MAX
             and cache.get(VALUE, 0) > cache.get(min_max, 0)
@@ -202,10 +461,9 @@ class Schedule:
             )
         if not self._schedule_found:
             return ACTIVE_PROGRAM
-        if self.time:
-            cache = self.get_temp_in_schedule()
-            if self._bus_type == CAN and cache.get(MODE) == ON:
-                return "currentSetpoint"
+        cache = self.get_temp_in_schedule()
+        if self._bus_type == CAN and cache.get(MODE) == ON:
+            return "currentSetpoint"
         return cache.get(MODE)
 
     def get_uri_setpoint_for_current_mode(self):
@@ -215,35 +473,118 @@ class Schedule:
             return self._setpoints_temp.get(self._op_mode.current_mode, {}).get(URI, -1)
         if not self._schedule_found:
             return ACTIVE_PROGRAM
-        if self.time:
-            cache = self.get_temp_in_schedule()
+        cache = self.get_temp_in_schedule()
         return cache.get(URI)
 
     def get_temp_in_schedule(self):
         """Find temp in schedule for current date."""
-        if self._time:
-            bosch_date = datetime.strptime(self._time, "%Y-%m-%dT%H:%M:%S")
-            day_of_week = DAYS_INT[bosch_date.weekday()]
-            if self._switch_points:
-                switch_points = self._switch_points.copy()
-                current_setpoint = {
-                    DAYOFWEEK: day_of_week,
-                    SETPOINT: "",
-                    TIME: self._get_minutes_since_midnight(bosch_date),
-                }
-                switch_points.append(current_setpoint)
-                switch_points.sort(key=sort_switchpoints)
-                _prev_setpoint = switch_points[
-                    switch_points.index(current_setpoint) - 1
-                ][SETPOINT]
-                return {
-                    MODE: _prev_setpoint,
-                    TEMP: self._setpoints_temp[_prev_setpoint][VALUE],
-                    MAX: self._setpoints_temp[_prev_setpoint][MAX],
-                    MIN: self._setpoints_temp[_prev_setpoint][MIN],
-                    URI: self._setpoints_temp[_prev_setpoint][URI],
-                }
-        return {}
+        now = self._now()
+        if now is None or not self._boundaries:
+            return {}
+        minute = week_minute(now)
+        memo = self._memo
+        if memo and (
+            memo[0] <= minute < memo[1] or memo[0] <= minute + WEEK < memo[1]
+        ):
+            return memo[2]
+        start, end, idx = self._segment(minute)
+        setpoint = self._boundary_setpoints[idx]
+        result = {
+            MODE: setpoint,
+            TEMP: self._setpoints_temp[setpoint][VALUE],
+            MAX: self._setpoints_temp[setpoint][MAX],
+            MIN: self._setpoints_temp[setpoint][MIN],
+            URI: self._setpoints_temp[setpoint][URI],
+        }
+        self._memo = (start, end, result)
+        return result
+
+    def _segment(self, minute):
+        """Return start, end and index of switch point active at minute of week."""
+        boundaries = self._boundaries
+        idx = bisect_right(boundaries, minute) - 1
+        if idx < 0:
+            return boundaries[-1] - WEEK, boundaries[0], idx
+        if idx + 1 < len(boundaries):
+            return boundaries[idx], boundaries[idx + 1], idx
+        return boundaries[idx], boundaries[0] + WEEK, idx
+
+    def seconds_to_switch(self):
+        """
+        Return seconds until next switch point.
+
+        None if schedule is unknown or time isn't advanced by gateway clock,
+        as it would stay at last update otherwise.
+        """
+        if not (self._clock and self._clock.synced and self._boundaries):
+            return None
+        now = self._clock.datetime()
+        minute = week_minute(now)
+        _, end, _ = self._segment(minute)
+        return (end - minute) * 60 - now.second - now.microsecond / 1e6
+
+    async def refresh_active_setpoint(self):
+        """Fetch temperature of setpoint active by schedule now."""
+        setpoint = self.get_temp_in_schedule().get(MODE)
+        if setpoint not in self._setpoints_temp:
+            return
+        cached = self._setpoints_temp[setpoint]
+        result = await self._connector.get(cached[URI], max_age=SETPOINT_MAX_AGE)
+        cached[VALUE] = result.get(VALUE, cached[VALUE])
+        cached[MAX] = result.get(MAX_VALUE, cached[MAX])
+        cached[MIN] = result.get(MIN_VALUE, cached[MIN])
+        self._memo = None
+        self._timelines = {}
+
+    def timeline(self, resolution=TIMELINE_RESOLUTION):
+        """
+        Return target temperature of whole week by schedule.
+
+        Slot i covers resolution minutes from Monday midnight + i * resolution.
+        It is numpy float32 array if numpy is installed, array("f") otherwise,
+        cached until schedule changes, so don't modify it.
+        """
+        timeline = self._timelines.get(resolution)
+        if timeline is not None:
+            return timeline
+        slots = timeline_slots(resolution)
+        temps = [
+            self._setpoints_temp[setpoint][VALUE]
+            for setpoint in self._boundary_setpoints
+        ]
+        if not temps:
+            timeline = constant_timeline(0, resolution)[:0]
+        elif numpy is not None:
+            minutes = numpy.arange(slots) * resolution
+            # index -1 before first switch point is last one of previous week
+            indexes = numpy.searchsorted(self._boundaries, minutes, side="right") - 1
+            timeline = numpy.asarray(temps, dtype=numpy.float32)[indexes]
+            timeline.flags.writeable = False
+        else:
+            timeline = array(
+                "f",
+                (
+                    temps[bisect_right(self._boundaries, slot * resolution) - 1]
+                    for slot in range(slots)
+                ),
+            )
+        self._timelines[resolution] = timeline
+        return timeline
+
+    def current_slot(self, resolution=TIMELINE_RESOLUTION):
+        """Return timeline slot of gateway time, None if time is unknown."""
+        now = self._now()
+        if now is None:
+            return None
+        return week_minute(now) // resolution
+
+    def forecast(self, hours=FORECAST_HOURS, resolution=TIMELINE_RESOLUTION):
+        """Return target temperatures by schedule from current slot for hours."""
+        timeline = self.timeline(resolution)
+        start = self.current_slot(resolution)
+        if start is None:
+            return timeline[:0]
+        return forecast_window(timeline, start, int(hours * 60) // resolution)
 
     def _get_minutes_since_midnight(self, date):
         """Retrieve minutes since midnight."""
@@ -253,3 +594,57 @@ class Schedule:
             ).total_seconds()
             / 60.0
         )
+
+
+class SwitchProgramEdit:
+    """Switch point edits uploaded together by Schedule.set_switch_points."""
+
+    def __init__(self, schedule, upload=None):
+        """:param upload: coroutine function uploading switch points."""
+        self._upload = upload or schedule.set_switch_points
+        self._points = {
+            (point[DAYOFWEEK], point[TIME]): point[SETPOINT]
+            for point in schedule.switch_points
+        }
+        self.uploaded = None
+
+    def set(self, day, time, setpoint):
+        """Switch to setpoint at minute of day, replacing point at that time."""
+        self._points[(day, time)] = setpoint
+        return self
+
+    def remove(self, day, time):
+        """Remove switch point."""
+        self._points.pop((day, time), None)
+        return self
+
+    def set_day(self, day, points):
+        """Replace switch points of day with (time, setpoint) pairs."""
+        for key in [key for key in self._points if key[0] == day]:
+            del self._points[key]
+        for time, setpoint in points:
+            self._points[(day, time)] = setpoint
+        return self
+
+    @property
+    def switch_points(self):
+        """Return edited switch points in gateway format."""
+        return sorted(
+            (
+                {DAYOFWEEK: day, SETPOINT: setpoint, TIME: time}
+                for (day, time), setpoint in self._points.items()
+            ),
+            key=sort_switchpoints,
+        )
+
+    async def commit(self):
+        """Upload edits, return True if anything was sent."""
+        self.uploaded = await self._upload(self.switch_points)
+        return self.uploaded
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, traceback):
+        if exc_type is None:
+            await self.commit()
@@ -0,0 +1,114 @@
+"""Polling of all entities in cycles with shared request budget."""
+import asyncio
+import logging
+from collections import OrderedDict
+
+from .cache import copy_json
+from .const import DEFAULT, REFS
+from .exceptions import DeviceException
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class PollScheduler:
+    """
+    Refresh refs of many entities in polling cycles.
+
+    Config comes from db json "refresh" section: "default" is number of
+    cycles between refreshes of a ref, "refs" overrides it per ref key,
+    either plain (status) or with entity type (dhw/setpoint1). URI used by
+    several entities is fetched once per cycle. With budget set, URIs over
+    it are carried over and go first in next cycle.
+    """
+
+    def __init__(self, get, config=None, budget=None):
+        """
+        :param get: coroutine function fetching URI.
+        :param int budget: maximum URIs fetched in cycle, None for unlimited.
+        """
+        self._get = get
+        self._config = None
+        self._default = 1
+        self._intervals = {}
+        self.budget = budget
+        self._cycle = 0
+        self._pending = OrderedDict()
+        self._requests = 0
+        self._deduplicated = 0
+        if config:
+            self.configure(config)
+
+    def configure(self, config):
+        """Replace refresh intervals."""
+        if config == self._config:
+            return
+        self._config = config
+        config = config or {}
+        self._default = max(int(config.get(DEFAULT, 1)), 1)
+        self._intervals = {
+            key: max(int(cycles), 1) for key, cycles in config.get(REFS, {}).items()
+        }
+
+    def interval(self, entity_type, key):
+        """Return number of cycles between refreshes of ref."""
+        interval = self._intervals.get(f"{entity_type}/{key}")
+        if interval is None:
+            interval = self._intervals.get(key, self._default)
+        return interval
+
+    def _due(self, entities):
+        """Map URIs due in this cycle to entity refs using them."""
+        due = OrderedDict((uri, list(refs)) for uri, refs in self._pending.items())
+        for entity in entities:
+            for key, uri in entity.refresh_refs().items():
+                if self._cycle % self.interval(entity.entity_type, key):
+                    continue
+                refs = due.setdefault(uri, [])
+                if (entity, key) not in refs:
+                    refs.append((entity, key))
+        return due
+
+    async def _fetch(self, uri):
+        try:
+            return await self._get(uri)
+        except DeviceException as err:
+            return err
+
+    async def run(self, entities):
+        """Run single polling cycle, return number of URIs fetched."""
+        due = self._due(entities)
+        uris = list(due)
+        if self.budget is not None:
+            uris, deferred = uris[: self.budget], uris[self.budget :]
+        else:
+            deferred = []
+        self._pending = OrderedDict((uri, due[uri]) for uri in deferred)
+        self._cycle += 1
+        results = await asyncio.gather(*(self._fetch(uri) for uri in uris))
+        errors = {}
+        updated = []
+        for uri, result in zip(uris, results):
+            refs = due[uri]
+            self._deduplicated += len(refs) - 1
+            for index, (entity, key) in enumerate(refs):
+                if entity not in updated:
+                    updated.append(entity)
+                if isinstance(result, DeviceException):
+                    _LOGGER.debug("Can't refresh %s of %s: %s", key, entity.name, result)
+                    errors[entity] = result
+                    continue
+                await entity.process_update(key, copy_json(result) if index else result)
+        for entity in updated:
+            entity.finish_update(errors.get(entity))
+        self._requests += len(uris)
+        return len(uris)
+
+    @property
+    def stats(self):
+        """Return polling counters."""
+        return {
+            "cycles": self._cycle,
+            "requests": self._requests,
+            "deduplicated": self._deduplicated,
+            "deferred": len(self._pending),
+        }
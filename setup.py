@@ -29,6 +29,11 @@ setup(
     download_url='https://github.com/moustic999/bosch-thermostat-http-client-python/archive/{}.zip'.format(__version__),
     packages=["bosch_thermostat_http"],
     install_requires=REQUIRES,
+    extras_require={
+        "cryptography": ["cryptography>=2.5"],
+        "orjson": ["orjson"],
+        "numpy": ["numpy"]
+    },
     include_package_data=True,
     license='Apache License 2.0',
     classifiers=[
@@ -50,4 +55,4 @@ setup(
             "bosch_examples=bosch_thermostat_http.bosch_examples:cli"
         ]
     }
-)
\ No newline at end of file
+)
\ No newline at end of file
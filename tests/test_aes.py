@@ -1,6 +1,8 @@
 import unittest
 import json
-from bosch_thermostat_http.encryption import Encryption
+from bosch_thermostat_http.const import PYAES
+from bosch_thermostat_http.encryption import Encryption, available_backends, available_json_parsers
+from bosch_thermostat_http.exceptions import DeviceException, EncryptionException
 
 
 class AesTest(unittest.TestCase):
@@ -21,3 +23,47 @@ class AesTest(unittest.TestCase):
         text_encrypted = b'TTZEYuh9QQoc0fjUgElBwA=='
         text_decrypted = self.client.decrypt(text_encrypted)
         self.assertEqual("super_secret", text_decrypted)
+
+
+class AesBackendTest(unittest.TestCase):
+
+    def test_backends_compatible(self):
+        text = json.dumps({"id": "/system/info", "value": "x" * 100})
+        clients = [Encryption('abc1abc2abc3abc4', 'passworddddd', backend=name)
+                   for name in available_backends()]
+        encrypted = {client.encrypt(text) for client in clients}
+        self.assertEqual(1, len(encrypted))
+        for client in clients:
+            self.assertEqual(text, client.decrypt(next(iter(encrypted))))
+
+    def test_backend_override(self):
+        client = Encryption('abc1abc2abc3abc4', 'passworddddd', backend=PYAES)
+        self.assertEqual(PYAES, client.backend)
+        self.assertEqual(b'TTZEYuh9QQoc0fjUgElBwA==', client.encrypt('super_secret'))
+
+    def test_unknown_backend(self):
+        with self.assertRaises(EncryptionException):
+            Encryption('abc1abc2abc3abc4', 'passworddddd', backend='nope')
+
+
+class DecodeTest(unittest.TestCase):
+
+    def test_decode_matches_legacy_path(self):
+        payload = {"id": "/system/info", "values": [{"Id": 158, "Brand": "Buderus"}] * 20}
+        for backend in available_backends():
+            for parser in available_json_parsers():
+                client = Encryption('abc1abc2abc3abc4', 'passworddddd', backend=backend, json_parser=parser)
+                encrypted = client.encrypt(json.dumps(payload))
+                self.assertEqual(json.loads(client.decrypt(encrypted)), client.decode(encrypted))
+                self.assertEqual({"value": 1}, client.decode(client.encrypt('{"value": 1}')))
+
+    def test_decode_invalid_json(self):
+        for parser in available_json_parsers():
+            client = Encryption('abc1abc2abc3abc4', 'passworddddd', json_parser=parser)
+            with self.assertRaises(DeviceException):
+                client.decode(client.encrypt('some_invalid_json'))
+
+    def test_fused_decode_only_with_orjson(self):
+        client = Encryption('abc1abc2abc3abc4', 'passworddddd', json_parser='json')
+        self.assertEqual({"value": 1}, client.decode(client.encrypt('{"value": 1}')))
+        self.assertIsNone(getattr(client._local, "buf", None))
@@ -0,0 +1,66 @@
+import pytest
+
+from bosch_thermostat_http.cache import LRUCache, ResponseCache, copy_json
+from bosch_thermostat_http.db import get_initial_db
+from bosch_thermostat_http.gateway import Gateway
+from bosch_thermostat_http.strings import Strings
+
+
+def test_lru_evicts_by_entries_and_bytes():
+    cache = LRUCache(2, max_bytes=100)
+    cache.set('a', 1, 10)
+    cache.set('b', 2, 10)
+    cache.get('a')
+    cache.set('c', 3, 10)
+    assert 'b' not in cache
+    cache.set('d', 4, 85)
+    assert 'a' not in cache and cache.get('d') == 4
+    cache.set('e', 5, 1000)
+    assert 'e' not in cache
+    assert cache.stats['evictions'] == 2
+
+
+def test_copy_json_is_deep():
+    data = {"a": [{"b": 1}]}
+    copied = copy_json(data)
+    copied["a"][0]["b"] = 2
+    assert data == {"a": [{"b": 1}]}
+
+
+def test_response_cache_ttl_classes():
+    cache = ResponseCache(10, {
+        "ttl": {"static": None, "volatile": 0},
+        "uris": {"static": ["/gateway/uuid", "/heatingCircuits/*/status"], "volatile": ["/system/bus"]},
+    })
+    assert cache.ttl_class('/heatingCircuits/hc2/status') == 'static'
+    assert cache.ttl_class('/gateway/DateTime') is None
+    cache.set('/gateway/uuid', {"value": "1"})
+    cache.set('/system/bus', {"value": "EMS"})
+    cache.set('/gateway/DateTime', {"value": "now"})
+    assert cache.get('/gateway/uuid') == {"value": "1"}
+    assert cache.get('/system/bus') is None
+    assert cache.get('/gateway/DateTime') is None
+    cache.invalidate('/gateway/uuid')
+    assert cache.get('/gateway/uuid') is None
+    assert (cache.stats['hits'], cache.stats['misses']) == (1, 2)
+
+
+@pytest.mark.asyncio
+async def test_check_connection_bypasses_response_cache():
+    gateway = Gateway(None, "127.0.0.1", "abc1abc2abc3abc4", "passworddddd")
+    initial_db = get_initial_db()
+    gateway._db = initial_db
+    gateway._str = Strings(initial_db["dict"])
+    gateway._initialized = True
+    gateway._connector.configure_response_cache(initial_db["cache"])
+    gateway._connector._response_cache.set("/gateway/uuid", {"value": "123"})
+    sent = []
+
+    async def send(ticket, method, path, **kwargs):
+        sent.append(path)
+        return {"value": "456"}
+
+    gateway._connector._send = send
+    assert await gateway.check_connection() == "456"
+    assert sent == ["/gateway/uuid"]
+    await gateway.close()
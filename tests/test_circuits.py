@@ -0,0 +1,285 @@
+import asyncio
+
+import pytest
+
+from bosch_thermostat_http.circuits import Circuits
+from bosch_thermostat_http.clock import GatewayClock
+from bosch_thermostat_http.const import (
+    CIRCUIT_TYPES,
+    DHW,
+    GATEWAY,
+    HC,
+    SYSTEM_INFO,
+    VALUES,
+)
+from bosch_thermostat_http.db import get_db_of_firmware, get_initial_db
+from bosch_thermostat_http.exceptions import DeviceException
+from bosch_thermostat_http.gateway import Gateway
+from bosch_thermostat_http.strings import Strings
+
+
+class FakeConnector:
+    def __init__(self, responses):
+        self.responses = responses
+        self.requests = []
+
+    async def get(self, path, priority=None, max_age=None):
+        self.requests.append(path)
+        if path not in self.responses:
+            raise DeviceException(f"URI {path} doesn not exist")
+        return self.responses[path]
+
+    async def put(self, path, value, priority=None, field="value"):
+        self.requests.append(("PUT", path, field, value))
+
+    def warm_put_cache(self, values):
+        list(values)
+
+
+def hc_responses(*names):
+    responses = {
+        "/heatingCircuits": {
+            "id": "/heatingCircuits",
+            "references": [{"id": f"/heatingCircuits/{name}"} for name in names],
+        }
+    }
+    for name in names:
+        base = f"/heatingCircuits/{name}"
+        responses[base] = {"id": base, "references": [{"id": f"{base}/status"}]}
+        responses[f"{base}/status"] = {"id": f"{base}/status", "value": "ACTIVE"}
+        responses[f"{base}/roomtemperature"] = {"value": 21.5}
+        responses[f"{base}/operationMode"] = {"value": "auto", "allowedValues": ["manual", "auto"]}
+        responses[f"{base}/activeSwitchProgram"] = {"value": "A"}
+    return responses
+
+
+async def current_date():
+    return "2020-01-06T12:00:00"
+
+
+@pytest.mark.asyncio
+async def test_lazy_circuits_fetch_nothing_until_materialized():
+    connector = FakeConnector(hc_responses("hc1", "hc2"))
+    database = get_db_of_firmware("RC300", "04.06.07")
+    str_obj = Strings(get_initial_db()["dict"])
+    circuits = Circuits(connector, HC, "EMS")
+    await circuits.initialize(database, str_obj, current_date, lazy=True)
+    assert connector.requests == ["/heatingCircuits", "/heatingCircuits/hc1", "/heatingCircuits/hc2"]
+    hc1, hc2 = circuits.circuits
+    assert not hc1.materialized and hc1.refresh_refs() == {} and not hc1.state
+    await hc1.materialize()
+    assert hc1.materialized and hc1.state == "ACTIVE"
+    assert hc1.current_temp == 21.5 and hc1.ha_mode == "auto"
+    assert not any(path.startswith("/heatingCircuits/hc2/") for path in connector.requests)
+    assert hc2._schedule_helper is None and hc2._op_mode_helper is None
+
+
+async def switch_circuit():
+    """Circuit in auto mode one second before switch from eco to comfort2."""
+    responses = hc_responses("hc1")
+    base = "/heatingCircuits/hc1"
+    responses[f"{base}/temporaryRoomSetpoint"] = {"value": 0}
+    responses[f"{base}/switchPrograms/A"] = {
+        "setpointProperty": {"id": f"{base}/temperatureLevels"},
+        "switchPoints": [
+            {"dayOfWeek": "Mo", "setpoint": "comfort2", "time": 360},
+            {"dayOfWeek": "Mo", "setpoint": "eco", "time": 1320},
+        ],
+    }
+    responses[f"{base}/temperatureLevels/comfort2"] = {"value": 21}
+    responses[f"{base}/temperatureLevels/eco"] = {"value": 16}
+    connector = FakeConnector(responses)
+
+    async def fetch_time():
+        return "2020-01-06T05:59:59"
+
+    database = get_db_of_firmware("RC300", "04.06.07")
+    str_obj = Strings(get_initial_db()["dict"])
+    circuits = Circuits(connector, HC, "EMS")
+    await circuits.initialize(database, str_obj, GatewayClock(fetch_time))
+    hc1 = circuits.circuits[0]
+    await hc1.update()
+    return hc1, responses
+
+
+@pytest.mark.asyncio
+async def test_switch_timer_refreshes_setpoint_at_switch_point():
+    hc1, responses = await switch_circuit()
+    base = "/heatingCircuits/hc1"
+    assert hc1.setpoint == "eco" and hc1.target_temperature == 16
+    events = []
+    hc1.subscribe(events.append)
+    hc1.start_switch_timer(delay=0)
+    assert hc1.switch_timer_armed
+    responses[f"{base}/temperatureLevels/comfort2"] = {"value": 22}
+    for _ in range(40):
+        if hc1.switch_timer_armed and events:
+            break
+        await asyncio.sleep(0.05)
+    assert [(event.field, event.old, event.new) for event in events] == [
+        ("setpoint", "eco", "comfort2"),
+        ("target_temperature", 16, 22),
+    ]
+    assert hc1.switch_timer_armed
+    hc1.stop_switch_timer()
+    assert not hc1.switch_timer_armed
+
+
+@pytest.mark.asyncio
+async def test_switch_timer_survives_unexpected_error(caplog):
+    hc1, _ = await switch_circuit()
+
+    async def broken():
+        raise KeyError("value")
+
+    hc1.schedule.refresh_active_setpoint = broken
+    hc1.start_switch_timer(delay=0)
+    handle = hc1._switch_handle
+    for _ in range(40):
+        if hc1._switch_handle is not handle and hc1.switch_timer_armed:
+            break
+        await asyncio.sleep(0.05)
+    assert hc1._switch_handle is not handle and hc1.switch_timer_armed
+    assert "Error refreshing hc1 at switch point" in caplog.text
+    hc1.stop_switch_timer()
+
+
+@pytest.mark.asyncio
+async def test_schedule_edit_rearms_timer_and_emits_events():
+    hc1, _ = await switch_circuit()
+    hc1.start_switch_timer(delay=0)
+    armed_at = hc1._switch_handle.when()
+    events = []
+    hc1.subscribe(events.append)
+    async with hc1.edit_schedule() as program:
+        program.set_day("Mo", [(300, "comfort2"), (1320, "eco")])
+    assert program.uploaded
+    assert hc1.connector.requests[-1][:3] == (
+        "PUT",
+        "/heatingCircuits/hc1/switchPrograms/A",
+        "switchPoints",
+    )
+    assert [(event.field, event.old, event.new) for event in events] == [
+        ("setpoint", "eco", "comfort2"),
+        ("target_temperature", 16, 21),
+    ]
+    # next switch point moved from 6:00 to 22:00
+    assert hc1._switch_handle.when() > armed_at + 15 * 3600
+    hc1.stop_switch_timer()
+
+
+class SlowConnector(FakeConnector):
+    def __init__(self, responses):
+        super().__init__(responses)
+        self.active = 0
+        self.max_active = 0
+
+    async def get(self, path, priority=None, max_age=None):
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            await asyncio.sleep(0.01)
+            return await super().get(path)
+        finally:
+            self.active -= 1
+
+
+@pytest.mark.asyncio
+async def test_circuits_initialized_with_bounded_parallelism():
+    names = [f"hc{index}" for index in range(1, 7)]
+    responses = hc_responses(*names)
+    del responses["/heatingCircuits/hc3/status"]
+    connector = SlowConnector(responses)
+    database = get_db_of_firmware("RC300", "04.06.07")
+    str_obj = Strings(get_initial_db()["dict"])
+    circuits = Circuits(connector, HC, "EMS")
+    await circuits.initialize(database, str_obj, current_date, parallelism=2)
+    assert connector.max_active == 2
+    assert [circuit.name for circuit in circuits.circuits] == [
+        "hc1",
+        "hc2",
+        "hc4",
+        "hc5",
+        "hc6",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_get_capabilities_skips_failing_circuit_type(monkeypatch):
+    gateway = Gateway(None, "127.0.0.1", "abc1abc2abc3abc4", "passworddddd")
+    gateway._connector = SlowConnector(hc_responses("hc1", "hc2", "hc3"))
+    gateway._db = get_db_of_firmware("RC300", "04.06.07")
+    gateway._str = Strings(get_initial_db()["dict"])
+    gateway._bus_type = "EMS"
+    initialize_circuits = gateway.initialize_circuits
+
+    async def failing_dhw(circ_type, parallelism=None, lazy=False):
+        if circ_type == DHW:
+            raise DeviceException("dhw is broken")
+        return await initialize_circuits(circ_type, parallelism, lazy)
+
+    monkeypatch.setattr(gateway, "initialize_circuits", failing_dhw)
+    assert await gateway.get_capabilities(parallelism=1) == [HC]
+    assert gateway._connector.max_active == 1
+    circuits = gateway.heating_circuits
+    assert [circuit.name for circuit in circuits] == ["hc1", "hc2", "hc3"]
+    timings = gateway.discovery_timings
+    assert set(timings) == set(CIRCUIT_TYPES)
+    assert all(seconds >= 0 for seconds in timings.values())
+    assert timings[HC] >= 0.04  # listing and 3 status requests one at a time
+
+
+def info_gateway(responses):
+    gateway = Gateway(None, "127.0.0.1", "abc1abc2abc3abc4", "passworddddd")
+    gateway._connector = FakeConnector(responses)
+    gateway._str = Strings(get_initial_db()["dict"])
+    return gateway
+
+
+async def sequential_update_info(gateway, initial_db):
+    # _update_info before URIs were fetched concurrently
+    for name, uri in initial_db.items():
+        try:
+            response = await gateway._connector.get(uri)
+            if gateway._str.val in response:
+                gateway._data[GATEWAY][name] = response[gateway._str.val]
+            elif name == SYSTEM_INFO:
+                gateway._data[GATEWAY][SYSTEM_INFO] = response.get(VALUES, [])
+        except DeviceException:
+            pass
+
+
+@pytest.mark.asyncio
+async def test_update_info_matches_sequential_with_failing_uri():
+    initial_db = get_initial_db()[GATEWAY]
+    responses = {
+        "/gateway/uuid": {"value": "123456789"},
+        "/gateway/versionFirmware": {"value": "04.06.07"},
+        "/system/info": {"values": [{"Id": 1}]},
+        "/gateway/DateTime": {"value": "2020-01-06T12:00:00"},
+    }
+    concurrent = info_gateway(responses)
+    sequential = info_gateway(responses)
+    await concurrent._update_info(initial_db)
+    await sequential_update_info(sequential, initial_db)
+    assert concurrent._data[GATEWAY] == sequential._data[GATEWAY]
+    assert concurrent._data[GATEWAY] == {
+        "uuid": "123456789",
+        "versionFirmware": "04.06.07",
+        "systemInfo": [{"Id": 1}],
+        "dateTime": "2020-01-06T12:00:00",
+    }
+
+
+@pytest.mark.asyncio
+async def test_update_info_propagates_unexpected_errors():
+    gateway = info_gateway({"/gateway/uuid": {"value": "123456789"}})
+
+    async def broken_get(path, priority=None, max_age=None):
+        if path == "/system/bus":
+            raise RuntimeError("broken")
+        return await FakeConnector.get(gateway._connector, path)
+
+    gateway._connector.get = broken_get
+    with pytest.raises(RuntimeError):
+        await gateway._update_info(get_initial_db()[GATEWAY])
@@ -0,0 +1,34 @@
+import pytest
+
+from bosch_thermostat_http.clock import GatewayClock
+
+
+class FakeTime:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.mark.asyncio
+async def test_clock_advances_locally_and_resyncs(monkeypatch):
+    fake = FakeTime()
+    monkeypatch.setattr("bosch_thermostat_http.clock.time", fake)
+    values = ["2020-01-06T12:00:00", "2020-01-06T12:15:00"]
+
+    async def fetch():
+        return values.pop(0)
+
+    clock = GatewayClock(fetch, resync_interval=900, drift_tolerance=30)
+    assert await clock.now() == "2020-01-06T12:00:00"
+    fake.now += 125
+    assert await clock.now() == "2020-01-06T12:02:05"
+    assert clock.stats["syncs"] == 1
+    fake.now += 775
+    assert await clock.now() == "2020-01-06T12:15:00"
+    assert clock.stats["drift"] == pytest.approx(-0.5)
+    fake.now += 300
+    assert clock.observe("2020-01-06T12:25:00") == pytest.approx(299.5)
+    assert clock.stats["interval"] == 450
+    assert clock.time == "2020-01-06T12:25:00"
@@ -0,0 +1,82 @@
+import asyncio
+import json
+
+import pytest
+
+from bosch_thermostat_http.discovery import DiscoveryCache
+from bosch_thermostat_http.gateway import Gateway
+
+
+@pytest.mark.asyncio
+async def test_discovery_cache_roundtrip(tmp_path):
+    cache = DiscoveryCache(str(tmp_path / "discovery.json"))
+    assert await cache.load("uuid1", "04.06.07") is None
+    await cache.save("uuid1", "04.06.07", {"device": "RC300"})
+    await cache.save("uuid2", "04.06.07", {"device": "RC35"})
+    assert await cache.load("uuid1", "04.06.07") == {"device": "RC300"}
+    assert await cache.load("uuid2", "04.06.07") == {"device": "RC35"}
+
+
+@pytest.mark.asyncio
+async def test_discovery_cache_firmware_change(tmp_path):
+    path = tmp_path / "discovery.json"
+    cache = DiscoveryCache(str(path))
+    await cache.save("uuid1", "04.06.07", {"device": "RC300"})
+    assert await cache.load("uuid1", "05.01.00") is None
+    await cache.save("uuid1", "05.01.00", {"device": "RC300"})
+    assert await cache.load("uuid1", "04.06.07") is None
+    assert len(json.loads(path.read_text())["gateways"]) == 1
+    await cache.invalidate("uuid1")
+    assert await cache.load("uuid1", "05.01.00") is None
+
+
+@pytest.mark.asyncio
+async def test_discovery_cache_ignores_broken_file(tmp_path):
+    path = tmp_path / "discovery.json"
+    path.write_text("{broken")
+    cache = DiscoveryCache(str(path))
+    assert await cache.load("uuid1", "04.06.07") is None
+    await cache.save("uuid1", "04.06.07", {"device": "RC300"})
+    assert await cache.load("uuid1", "04.06.07") == {"device": "RC300"}
+
+
+@pytest.mark.asyncio
+async def test_discovery_cache_batches_concurrent_saves(tmp_path, monkeypatch):
+    path = tmp_path / "discovery.json"
+    cache = DiscoveryCache(str(path))
+    writes = []
+    write = cache._write
+
+    def counted_write(gateways):
+        writes.append(len(gateways))
+        write(gateways)
+
+    monkeypatch.setattr(cache, "_write", counted_write)
+    await asyncio.gather(
+        *(cache.save(f"uuid{index}", "04.06.07", {"index": index}) for index in range(20))
+    )
+    assert len(writes) < 20 and writes[-1] == 20
+    reloaded = DiscoveryCache(str(path))
+    assert await reloaded.load("uuid7", "04.06.07") == {"index": 7}
+
+
+@pytest.mark.asyncio
+async def test_discovery_cache_survives_unserializable_result(tmp_path):
+    cache = DiscoveryCache(str(tmp_path / "discovery.json"))
+    await cache.save("uuid1", "04.06.07", {"device": object()})
+    assert not (tmp_path / "discovery.json").exists()
+
+
+@pytest.mark.asyncio
+async def test_failed_revalidation_is_logged(caplog):
+    gateway = Gateway(None, "127.0.0.1", "abc1abc2abc3abc4", "passworddddd")
+
+    async def revalidate():
+        raise KeyError("value")
+
+    task = asyncio.ensure_future(revalidate())
+    task.add_done_callback(gateway._revalidation_done)
+    await asyncio.gather(task, return_exceptions=True)
+    await asyncio.sleep(0)
+    assert "Revalidation of None failed" in caplog.text
+    await gateway.close()
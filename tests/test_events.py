@@ -0,0 +1,78 @@
+import asyncio
+
+import pytest
+
+from bosch_thermostat_http.db import get_initial_db
+from bosch_thermostat_http.events import EventBus
+from bosch_thermostat_http.sensors import Sensor
+from bosch_thermostat_http.strings import Strings
+
+
+def make_sensor():
+    str_obj = Strings(get_initial_db()["dict"])
+    return Sensor(None, "outdoor_t1", "Outdoor", "/outdoor_t1", str_obj)
+
+
+def test_only_changed_fields_are_emitted():
+    sensor = make_sensor()
+    gateway_bus = EventBus()
+    sensor.bus.parent = gateway_bus
+    events, forwarded = [], []
+    unsubscribe = sensor.subscribe(events.append)
+    gateway_bus.subscribe(forwarded.append)
+    sensor.process_results({"value": 5.0, "unitOfMeasure": "C"}, "outdoor_t1")
+    sensor.process_results({"value": 5.0, "unitOfMeasure": "C"}, "outdoor_t1")
+    sensor.process_results({"value": 6.5, "unitOfMeasure": "C"}, "outdoor_t1")
+    assert [(e.field, e.old, e.new) for e in events] == [
+        ("value", None, 5.0),
+        ("unitOfMeasure", None, "C"),
+        ("value", 5.0, 6.5),
+    ]
+    assert forwarded == events
+    unsubscribe()
+    sensor.process_results({"value": 7.0}, "outdoor_t1")
+    assert len(events) == 3 and len(forwarded) == 4
+
+
+@pytest.mark.asyncio
+async def test_events_async_iterator():
+    sensor = make_sensor()
+    iterator = sensor.events()
+    task = asyncio.ensure_future(iterator.__anext__())
+    await asyncio.sleep(0)
+    sensor.process_results({"value": 1.0}, "outdoor_t1")
+    event = await asyncio.wait_for(task, 1)
+    assert (event.entity, event.key, event.new) == (sensor, "outdoor_t1", 1.0)
+    await iterator.aclose()
+    assert not sensor.bus.active
+
+
+@pytest.mark.asyncio
+async def test_events_queued_from_iterator_creation():
+    bus = EventBus()
+    iterator = bus.events(maxsize=1)
+    assert bus.active
+    bus.emit("first")
+    bus.emit("second")
+    assert await iterator.__anext__() == "second"
+    pending = asyncio.ensure_future(iterator.__anext__())
+    await asyncio.sleep(0)
+    await iterator.aclose()
+    with pytest.raises(StopAsyncIteration):
+        await asyncio.wait_for(pending, 1)
+    assert not bus.active
+    bus.emit("third")
+    with pytest.raises(StopAsyncIteration):
+        await iterator.__anext__()
+
+
+@pytest.mark.asyncio
+async def test_events_queue_removed_when_iteration_cancelled():
+    bus = EventBus()
+    iterator = bus.events()
+    task = asyncio.ensure_future(iterator.__anext__())
+    await asyncio.sleep(0)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    assert not bus.active
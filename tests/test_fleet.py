@@ -0,0 +1,47 @@
+import asyncio
+
+import pytest
+from aiohttp import ClientSession
+
+from bosch_thermostat_http.fleet import GatewayFleet
+
+
+@pytest.mark.asyncio
+async def test_unexpected_poll_error_keeps_polling():
+    async with ClientSession() as session:
+        fleet = GatewayFleet(session=session, poll_interval=0.01)
+        gateway = await fleet.add("127.0.0.1", "abc1abc2abc3abc4", "passworddddd")
+        fleet._initialized.add("127.0.0.1")
+        calls = []
+
+        async def update_all():
+            calls.append(1)
+            raise KeyError("value")
+
+        gateway.update_all = update_all
+        assert not await fleet.poll("127.0.0.1")
+        health = fleet.health["127.0.0.1"]
+        assert not health["healthy"] and health["last_error"] == "'value'"
+        await fleet.start()
+        for _ in range(50):
+            if len(calls) > 3:
+                break
+            await asyncio.sleep(0.01)
+        assert len(calls) > 3 and not fleet._tasks["127.0.0.1"].done()
+        assert fleet.health["127.0.0.1"]["failures"] == len(calls)
+        await fleet.close()
+
+
+@pytest.mark.asyncio
+async def test_owned_session_created_by_add():
+    fleet = GatewayFleet()
+    await fleet.remove("127.0.0.1")
+    gateway = await fleet.add("127.0.0.1", "abc1abc2abc3abc4", "passworddddd")
+    assert fleet.session is not None and not fleet.session.closed
+    assert fleet.gateways == {"127.0.0.1": gateway}
+    await fleet.remove("127.0.0.1")
+    await fleet.remove("127.0.0.1")
+    assert fleet.gateways == {}
+    session = fleet.session
+    await fleet.close()
+    assert session.closed
@@ -2,11 +2,14 @@ import unittest
 import json
 import asyncio
 import pytest
+import aiohttp
 from aiohttp.test_utils import AioHTTPTestCase, unittest_run_loop
 from aiohttp import web, ClientSession
 from bosch_thermostat_http.http_connector import HttpConnector
 from bosch_thermostat_http.encryption import Encryption
+from bosch_thermostat_http.request_queue import RequestQueue
 from bosch_thermostat_http.errors import *
+from bosch_thermostat_http.exceptions import ConnectionException, DeviceException
 from .gateway_test_server import GatewayTestServer
 
 TIMEOUT=1
@@ -62,4 +65,234 @@ async def test_request_forbidden():
             assert request.path_qs == '/blablabla'
             server.send_response(request, status=403)
             with pytest.raises(ResponseError):
-                await task
\ No newline at end of file
+                await task
+
+async def _get_encrypted(server, connector, path, body):
+    task = asyncio.ensure_future(connector.get(path))
+    request = await server.receive_request()
+    assert request.path_qs == path
+    server.send_response(request, body=connector._encryption.encrypt(body), content_type='application/json')
+    return await task
+
+
+@pytest.mark.asyncio
+async def test_get_decoded_in_executor():
+    async with GatewayTestServer() as server:
+        async with ClientSession() as session:
+            gtw_host = str(server.host)+':' + str(server.port)
+            encryption = Encryption('abc1abc2abc3abc4', 'passworddddd')
+            connector = HttpConnector(gtw_host, session, encryption, executor='thread', offload_threshold=64)
+            small = await _get_encrypted(server, connector, '/gateway/uuid', '{"value": "1"}')
+            big = await _get_encrypted(server, connector, '/system/info', json.dumps({"values": ["x" * 100]}))
+            await connector.close()
+            assert small == {"value": "1"}
+            assert big == {"values": ["x" * 100]}
+            assert connector.decode_stats['inline'] == 1
+            assert connector.decode_stats['offloaded'] == 1
+
+
+@pytest.mark.asyncio
+async def test_decode_cache_hit_returns_copy():
+    async with GatewayTestServer() as server:
+        async with ClientSession() as session:
+            gtw_host = str(server.host)+':' + str(server.port)
+            encryption = Encryption('abc1abc2abc3abc4', 'passworddddd')
+            connector = HttpConnector(gtw_host, session, encryption)
+            body = '{"value": "auto", "allowedValues": ["manual", "auto"]}'
+            first = await _get_encrypted(server, connector, '/heatingCircuits/hc1/operationMode', body)
+            first["allowedValues"].append("changed")
+            second = await _get_encrypted(server, connector, '/heatingCircuits/hc1/operationMode', body)
+            assert second == {"value": "auto", "allowedValues": ["manual", "auto"]}
+            stats = connector.cache_stats['decode']
+            assert (stats['hits'], stats['misses']) == (1, 1)
+
+
+@pytest.mark.asyncio
+async def test_put_body_cached_by_value():
+    async with GatewayTestServer() as server:
+        async with ClientSession() as session:
+            gtw_host = str(server.host)+':' + str(server.port)
+            encryption = Encryption('abc1abc2abc3abc4', 'passworddddd')
+            connector = HttpConnector(gtw_host, session, encryption)
+            connector.warm_put_cache(["manual", "auto"])
+            for value in ("auto", 21, 21.0):
+                task = asyncio.ensure_future(connector.put('/heatingCircuits/hc1/operationMode', value))
+                request = await server.receive_request()
+                assert encryption.decode(await request.read()) == {"value": value}
+                server.send_response(request, status=204)
+                assert await task is True
+            stats = connector.cache_stats['put']
+            assert (stats['hits'], stats['misses'], stats['entries']) == (1, 2, 4)
+
+
+@pytest.mark.asyncio
+async def test_concurrent_gets_coalesced():
+    async with GatewayTestServer() as server:
+        async with ClientSession() as session:
+            gtw_host = str(server.host)+':' + str(server.port)
+            encryption = Encryption('abc1abc2abc3abc4', 'passworddddd')
+            connector = HttpConnector(gtw_host, session, encryption, max_in_flight=2)
+            tasks = [asyncio.ensure_future(connector.get(path))
+                     for path in ('/system/bus', '/system/bus', '/gateway/uuid')]
+            requests = [await server.receive_request(), await server.receive_request()]
+            for request in requests:
+                server.send_response(request, body=encryption.encrypt('{"value": "%s"}' % request.path),
+                                     content_type='application/json')
+            first, second, third = await asyncio.gather(*tasks)
+            assert first == second == {"value": "/system/bus"} and first is not second
+            assert third == {"value": "/gateway/uuid"}
+            assert server.awaiting_request_count == 0
+            stats = connector.request_stats
+            assert (stats['requests'], stats['coalesced']) == (2, 1)
+
+
+@pytest.mark.asyncio
+async def test_get_after_put_not_joined_to_older_get():
+    async with GatewayTestServer() as server:
+        async with ClientSession() as session:
+            gtw_host = str(server.host)+':' + str(server.port)
+            encryption = Encryption('abc1abc2abc3abc4', 'passworddddd')
+            connector = HttpConnector(gtw_host, session, encryption, max_in_flight=2)
+            path = '/heatingCircuits/hc1/operationMode'
+            slow = asyncio.ensure_future(connector.get(path))
+            slow_request = await server.receive_request()
+            put = asyncio.ensure_future(connector.put(path, 'new'))
+            server.send_response(await server.receive_request(), status=204)
+            await put
+            fresh = asyncio.ensure_future(connector.get(path))
+            server.send_response(await server.receive_request(), body=encryption.encrypt('{"value": "new"}'),
+                                 content_type='application/json')
+            assert await fresh == {"value": "new"}
+            server.send_response(slow_request, body=encryption.encrypt('{"value": "old"}'),
+                                 content_type='application/json')
+            assert await slow == {"value": "old"}
+            assert connector.request_stats['coalesced'] == 0
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("error", [
+    aiohttp.ServerTimeoutError,
+    getattr(aiohttp, "ConnectionTimeoutError", aiohttp.ServerTimeoutError),
+])
+async def test_client_timeouts_back_off(error):
+    async with ClientSession() as session:
+        encryption = Encryption('abc1abc2abc3abc4', 'passworddddd')
+        connector = HttpConnector('127.0.0.1', session, encryption)
+
+        def get(url, **kwargs):
+            raise error("timed out")
+
+        with pytest.raises(ConnectionException):
+            await connector._request(get, '/system/bus')
+        assert connector.timeouts['/system/bus']['timeouts'] == 1
+
+
+@pytest.mark.asyncio
+async def test_owned_session_reuses_connection():
+    async with GatewayTestServer() as server:
+        gtw_host = str(server.host)+':' + str(server.port)
+        encryption = Encryption('abc1abc2abc3abc4', 'passworddddd')
+        connector = HttpConnector(gtw_host, None, encryption)
+        for path in ('/gateway/uuid', '/system/bus'):
+            assert await _get_encrypted(server, connector, path, '{"value": 1}') == {"value": 1}
+        stats = connector.connection_stats
+        await connector.close()
+        assert (stats['handshakes'], stats['reused']) == (1, 1)
+
+
+@pytest.mark.asyncio
+async def test_missing_uri_negative_cached():
+    async with GatewayTestServer() as server:
+        async with ClientSession() as session:
+            gtw_host = str(server.host)+':' + str(server.port)
+            encryption = Encryption('abc1abc2abc3abc4', 'passworddddd')
+            connector = HttpConnector(gtw_host, session, encryption)
+            task = asyncio.ensure_future(connector.get('/heatingCircuits/hc1/nothing'))
+            server.send_response(await server.receive_request(), status=404)
+            with pytest.raises(DeviceException):
+                await task
+            with pytest.raises(DeviceException):
+                await connector.get('/heatingCircuits/hc1/nothing')
+            assert connector.request_stats['requests'] == 1
+            assert connector.cache_stats['negative']['hits'] == 1
+            connector.invalidate_negative_cache('/heatingCircuits/hc1/nothing')
+            assert await _get_encrypted(server, connector, '/heatingCircuits/hc1/nothing', '{"value": 1}') == {"value": 1}
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("status", [401, 403])
+async def test_auth_errors_not_negative_cached(status):
+    async with GatewayTestServer() as server:
+        async with ClientSession() as session:
+            gtw_host = str(server.host)+':' + str(server.port)
+            encryption = Encryption('abc1abc2abc3abc4', 'passworddddd')
+            connector = HttpConnector(gtw_host, session, encryption)
+            path = '/heatingCircuits/hc1/operationMode'
+            task = asyncio.ensure_future(connector.get(path))
+            server.send_response(await server.receive_request(), status=status)
+            with pytest.raises(DeviceException):
+                await task
+            assert await _get_encrypted(server, connector, path, '{"value": "auto"}') == {"value": "auto"}
+            assert connector.cache_stats['negative']['entries'] == 0
+
+
+@pytest.mark.asyncio
+async def test_response_cache_invalidated_by_put():
+    async with GatewayTestServer() as server:
+        async with ClientSession() as session:
+            gtw_host = str(server.host)+':' + str(server.port)
+            encryption = Encryption('abc1abc2abc3abc4', 'passworddddd')
+            connector = HttpConnector(gtw_host, session, encryption, response_cache={
+                "ttl": {"slow": 3600}, "uris": {"slow": ["/heatingCircuits/*/operationMode"]}})
+            path = '/heatingCircuits/hc1/operationMode'
+            assert await _get_encrypted(server, connector, path, '{"value": "auto"}') == {"value": "auto"}
+            assert await connector.get(path) == {"value": "auto"}
+            task = asyncio.ensure_future(connector.put(path, "manual"))
+            server.send_response(await server.receive_request(), status=204)
+            await task
+            assert await _get_encrypted(server, connector, path, '{"value": "manual"}') == {"value": "manual"}
+            assert connector.cache_stats['response']['hits'] == 1
+
+
+@pytest.mark.asyncio
+async def test_get_with_max_age_reuses_recent_response():
+    async with GatewayTestServer() as server:
+        async with ClientSession() as session:
+            gtw_host = str(server.host)+':' + str(server.port)
+            encryption = Encryption('abc1abc2abc3abc4', 'passworddddd')
+            connector = HttpConnector(gtw_host, session, encryption)
+            path = '/heatingCircuits/hc1/temperatureLevels/eco'
+            task = asyncio.ensure_future(connector.get(path, max_age=10))
+            request = await server.receive_request()
+            server.send_response(request, body=encryption.encrypt('{"value": 16}'), content_type='application/json')
+            assert await task == {"value": 16}
+            assert await connector.get(path, max_age=10) == {"value": 16}
+            assert connector.request_stats['requests'] == 1
+            assert await _get_encrypted(server, connector, path, '{"value": 17}') == {"value": 17}
+            task = asyncio.ensure_future(connector.put(path, 18))
+            server.send_response(await server.receive_request(), status=204)
+            await task
+            task = asyncio.ensure_future(connector.get(path, max_age=10))
+            request = await server.receive_request()
+            server.send_response(request, body=encryption.encrypt('{"value": 18}'), content_type='application/json')
+            assert await task == {"value": 18}
+
+
+@pytest.mark.asyncio
+async def test_shared_limiter_caps_requests_of_all_connectors():
+    async with GatewayTestServer() as server:
+        async with ClientSession() as session:
+            gtw_host = str(server.host)+':' + str(server.port)
+            encryption = Encryption('abc1abc2abc3abc4', 'passworddddd')
+            limiter = RequestQueue(1)
+            connectors = [HttpConnector(gtw_host, session, encryption, max_in_flight=2, limiter=limiter)
+                          for _ in range(2)]
+            tasks = [asyncio.ensure_future(connector.get(path))
+                     for connector in connectors for path in ('/gateway/uuid', '/system/bus')]
+            for _ in tasks:
+                request = await server.receive_request()
+                await asyncio.sleep(0.01)
+                assert server.awaiting_request_count == 0
+                server.send_response(request, body=encryption.encrypt('{"value": 1}'),
+                                     content_type='application/json')
+            assert await asyncio.gather(*tasks) == [{"value": 1}] * 4
@@ -0,0 +1,18 @@
+from bosch_thermostat_http.latency import LatencyTracker
+
+
+def test_latency_tracker_timeout_bounds():
+    tracker = LatencyTracker(floor=0.5, ceiling=10, min_samples=3)
+    assert tracker.timeout('/heatingCircuits/hc1/status') == 10
+    for latency in (0.1, 0.12, 0.11):
+        tracker.add('/heatingCircuits/hc1/status', latency)
+    assert tracker.timeout('/heatingCircuits/hc1/status') == 0.5
+    assert tracker.timeout('/heatingCircuits/hc2/status') == 0.5
+    assert tracker.timeout('/system/bus') == 10
+    for latency in (2, 2.5, 3):
+        tracker.add('/system/bus', latency)
+    timeout = tracker.timeout('/system/bus')
+    assert 3 < timeout < 10
+    tracker.backoff('/system/bus')
+    assert tracker.timeout('/system/bus') > timeout
+    assert tracker.estimates['/system/bus']['timeouts'] == 1
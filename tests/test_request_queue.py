@@ -0,0 +1,44 @@
+import asyncio
+import pytest
+from bosch_thermostat_http.request_queue import RequestQueue
+
+
+async def _run(queue, order, name, rank, group):
+    await queue.acquire(queue.ticket(rank, group))
+    order.append(name)
+    await asyncio.sleep(0)
+    queue.release()
+
+
+@pytest.mark.asyncio
+async def test_rank_then_round_robin_across_groups():
+    queue = RequestQueue(1)
+    blocker = queue.ticket(2, 'hc1')
+    await queue.acquire(blocker)
+    order = []
+    tasks = [asyncio.ensure_future(_run(queue, order, name, rank, group)) for name, rank, group in (
+        ('hc1-a', 2, 'hc1'), ('hc1-b', 2, 'hc1'), ('hc2-a', 2, 'hc2'), ('put', 0, 'hc2'))]
+    await asyncio.sleep(0)
+    assert queue.waiting == 4
+    queue.release()
+    await asyncio.gather(*tasks)
+    assert order == ['put', 'hc1-a', 'hc2-a', 'hc1-b']
+
+
+@pytest.mark.asyncio
+async def test_promote_and_cancel():
+    queue = RequestQueue(1)
+    await queue.acquire(queue.ticket(2))
+    order = []
+    slow = queue.ticket(2, 'a')
+    slow_task = asyncio.ensure_future(queue.acquire(slow))
+    cancelled = asyncio.ensure_future(_run(queue, order, 'cancelled', 1, 'b'))
+    other = asyncio.ensure_future(_run(queue, order, 'other', 1, 'c'))
+    await asyncio.sleep(0)
+    queue.promote(slow, 0)
+    cancelled.cancel()
+    queue.release()
+    await slow_task
+    queue.release()
+    await other
+    assert order == ['other'] and queue.waiting == 0
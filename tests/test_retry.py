@@ -0,0 +1,45 @@
+import socket
+import pytest
+from aiohttp import ClientSession
+from bosch_thermostat_http.encryption import Encryption
+from bosch_thermostat_http.exceptions import ConnectionException
+from bosch_thermostat_http.http_connector import HttpConnector
+from bosch_thermostat_http.retry import CircuitBreaker, RetryPolicy, CLOSED, OPEN, HALF_OPEN
+
+
+def test_breaker_opens_and_probes():
+    breaker = CircuitBreaker(threshold=2, reset_timeout=0)
+    breaker.failure()
+    assert breaker.state == CLOSED
+    breaker.failure()
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.failure()
+    breaker.reset_timeout = 60
+    assert breaker.state == OPEN and not breaker.allow()
+    breaker.reset_timeout = 0
+    assert breaker.allow()
+    breaker.success()
+    assert breaker.state == CLOSED and breaker.stats['rejected'] == 2
+
+
+def test_retry_delay_bounded():
+    policy = RetryPolicy(attempts=5, base_delay=1, max_delay=3)
+    assert all(0 <= policy.delay(attempt) <= 3 for attempt in range(10))
+
+
+@pytest.mark.asyncio
+async def test_unreachable_gateway_fails_fast():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    async with ClientSession() as session:
+        encryption = Encryption('abc1abc2abc3abc4', 'passworddddd')
+        connector = HttpConnector(f'127.0.0.1:{port}', session, encryption,
+                                  retry_attempts=1, breaker_threshold=2)
+        for _ in range(3):
+            with pytest.raises(ConnectionException):
+                await connector.get('/gateway/uuid')
+        assert connector.request_stats['requests'] == 2
+        assert connector.breaker_stats['state'] == OPEN
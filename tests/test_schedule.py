@@ -0,0 +1,236 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from bosch_thermostat_http.const import (
+    ACTIVE_PROGRAM,
+    DATE_FORMAT,
+    DAYOFWEEK,
+    DAYS_INT,
+    MODE,
+    SETPOINT,
+    STATE,
+    SWITCH_POINTS,
+    SWITCHPROGRAM,
+    TIME,
+)
+from bosch_thermostat_http.exceptions import DeviceException
+from bosch_thermostat_http.schedule import Schedule, sort_switchpoints, stack_forecasts
+
+SWITCH = [
+    {DAYOFWEEK: "Mo", SETPOINT: "comfort2", TIME: 360},
+    {DAYOFWEEK: "Mo", SETPOINT: "eco", TIME: 1320},
+    {DAYOFWEEK: "We", SETPOINT: "comfort1", TIME: 0},
+    {DAYOFWEEK: "Sa", SETPOINT: "comfort2", TIME: 480},
+    {DAYOFWEEK: "Su", SETPOINT: "eco", TIME: 1380},
+]
+SETPOINTS = {
+    name: {MODE: name, "value": temp, "max": 30, "min": 5, "uri": f"/sp/{name}"}
+    for name, temp in (("comfort2", 21), ("comfort1", 19), ("eco", 16))
+}
+
+
+class OpMode:
+    is_manual = False
+    is_auto = True
+    current_mode = "auto"
+
+
+def make_schedule(time):
+    schedule = Schedule(
+        None, "hc", "hc1", None, None, "EMS", {SWITCHPROGRAM: "/{}/{}"}, OpMode()
+    )
+    schedule.restore(
+        {
+            ACTIVE_PROGRAM: "A",
+            SWITCH_POINTS: SWITCH,
+            SETPOINT: {name: dict(value) for name, value in SETPOINTS.items()},
+            STATE: True,
+        },
+        time,
+    )
+    return schedule
+
+
+def legacy_setpoint(time):
+    date = datetime.strptime(time, DATE_FORMAT)
+    current = {
+        DAYOFWEEK: DAYS_INT[date.weekday()],
+        SETPOINT: "",
+        TIME: date.hour * 60 + date.minute,
+    }
+    points = SWITCH + [current]
+    points.sort(key=sort_switchpoints)
+    return points[points.index(current) - 1][SETPOINT]
+
+
+def test_index_matches_sorted_lookup():
+    start = datetime(2020, 1, 6)  # monday
+    schedule = make_schedule(None)
+    for minutes in range(0, 7 * 1440, 20):
+        time = (start + timedelta(minutes=minutes)).strftime(DATE_FORMAT)
+        schedule._time = time
+        assert schedule.get_setpoint_for_current_mode() == legacy_setpoint(time), time
+
+
+@pytest.mark.parametrize(
+    "time,setpoint",
+    [
+        ("2020-01-06T05:59:59", "eco"),  # before first point wraps to sunday
+        ("2020-01-06T06:00:00", "comfort2"),  # exactly at boundary
+        ("2020-01-12T23:30:00", "eco"),  # after last point
+        ("2020-01-08T00:00:00", "comfort1"),
+    ],
+)
+def test_boundaries(time, setpoint):
+    schedule = make_schedule(time)
+    assert schedule.get_setpoint_for_current_mode() == setpoint
+    assert schedule.get_temp_for_current_mode() == SETPOINTS[setpoint]["value"]
+
+
+def test_memo_follows_time_and_setpoint_changes():
+    schedule = make_schedule("2020-01-06T07:00:00")
+    assert schedule.get_temp_for_current_mode() == 21
+    schedule._time = "2020-01-06T21:59:00"
+    assert schedule.get_temp_in_schedule() is schedule.get_temp_in_schedule()
+    assert schedule.get_temp_for_current_mode() == 21
+    schedule.cache_temp_for_mode(22.5)
+    assert schedule.get_temp_for_current_mode() == 22.5
+    schedule._time = "2020-01-06T22:00:00"
+    assert schedule.get_setpoint_for_current_mode() == "eco"
+
+
+def test_timeline_and_forecast():
+    schedule = make_schedule("2020-01-12T23:10:00")
+    timeline = schedule.timeline(60)
+    assert len(timeline) == 7 * 24
+    assert list(timeline[:6]) == [16] * 6  # sunday eco until monday 6:00
+    assert list(timeline[6:8]) == [21, 21]
+    assert schedule.timeline(60) is timeline
+    forecast = schedule.forecast(hours=3, resolution=60)
+    assert list(forecast) == [16, 16, 16]  # wraps to monday
+    schedule._time = "2020-01-06T04:30:00"
+    assert list(schedule.forecast(hours=3, resolution=60)) == [16, 16, 21]
+    with pytest.raises(ValueError):
+        schedule.timeline(11)
+
+
+def test_stack_forecasts():
+    schedule = make_schedule(None)
+    timeline = schedule.timeline(60)
+    rows = stack_forecasts([timeline, timeline], [5, 7 * 24 - 1], 2)
+    assert [list(row) for row in rows] == [[16, 21], [16, 16]]
+
+
+class SlowConnector:
+    def __init__(self):
+        self.active = 0
+        self.max_active = 0
+        self.requests = []
+
+    async def get(self, path, priority=None, max_age=None):
+        self.requests.append(path)
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        await asyncio.sleep(0.01)
+        self.active -= 1
+        return {"value": 20, "minValue": 5, "maxValue": 30}
+
+
+@pytest.mark.asyncio
+async def test_setpoints_fetched_concurrently():
+    connector = SlowConnector()
+    schedule = Schedule(
+        connector, "hc", "hc1", None, None, "EMS", {SWITCHPROGRAM: "/{}/{}"}, OpMode()
+    )
+    await schedule._parse_schedule(SWITCH, {"id": "/hc1/temperatureLevels"})
+    assert sorted(connector.requests) == [
+        "/hc1/temperatureLevels/comfort1",
+        "/hc1/temperatureLevels/comfort2",
+        "/hc1/temperatureLevels/eco",
+    ]
+    assert connector.max_active == 3
+    assert set(schedule.setpoints) == {"comfort1", "comfort2", "eco"}
+
+
+class RecordingConnector:
+    def __init__(self):
+        self.gets = []
+        self.puts = []
+
+    async def get(self, path, priority=None, max_age=None):
+        self.gets.append(path)
+        if path.endswith("/missing"):
+            raise DeviceException(f"URI {path} doesn not exist")
+        return {"value": 23, "minValue": 5, "maxValue": 30}
+
+    async def put(self, path, value, priority=None, field="value"):
+        self.puts.append((path, field, value))
+
+
+@pytest.mark.asyncio
+async def test_switch_point_edits_uploaded_in_single_put():
+    connector = RecordingConnector()
+    schedule = make_schedule("2020-01-06T07:00:00")
+    schedule._connector = connector
+    schedule._program = {
+        "setpointProperty": {"id": "/sp"},
+        "switchPointTimeRaster": 15,
+        "maxNbOfSwitchPointsPerDay": 6,
+    }
+    async with schedule.edit() as program:
+        program.set("Mo", 360, "comfort2")
+    assert program.uploaded is False and connector.puts == []
+
+    async with schedule.edit() as program:
+        program.set("Mo", 420, "comfort3").remove("We", 0)
+        program.set_day("Tu", [(300, "eco"), (600, "comfort1")])
+    assert program.uploaded is True
+    [(path, field, points)] = connector.puts
+    assert path == "/hc1/A" and field == "switchPoints"
+    assert points == program.switch_points and len(points) == 7
+    assert connector.gets == ["/sp/comfort3"]
+    assert schedule.get_setpoint_for_current_mode() == "comfort3"
+    assert schedule.get_temp_for_current_mode() == 23
+
+    assert not await schedule.edit().set("Mo", 425, "eco").commit()
+    assert len(connector.puts) == 1
+
+    assert not await schedule.edit().set("Mo", 480, "missing").commit()
+    assert len(connector.puts) == 1
+    assert "missing" not in schedule.setpoints
+
+
+def test_numpy_timeline_and_stacked_forecasts():
+    numpy = pytest.importorskip("numpy")
+    schedule = make_schedule("2020-01-12T23:10:00")
+    timeline = schedule.timeline(60)
+    assert isinstance(timeline, numpy.ndarray) and timeline.dtype == numpy.float32
+    assert not timeline.flags.writeable
+    assert timeline[:8].tolist() == [16] * 6 + [21, 21]
+    assert schedule.forecast(hours=3, resolution=60).tolist() == [16, 16, 16]
+    rows = stack_forecasts([timeline, timeline], [5, 7 * 24 - 1], 2)
+    assert rows.shape == (2, 2) and rows.tolist() == [[16, 21], [16, 16]]
+
+
+def test_snapshot_and_restore_copy_data():
+    schedule = make_schedule("2020-01-06T07:00:00")
+    snapshot = schedule.snapshot()
+    schedule.cache_temp_for_mode(25)
+    assert snapshot["setpoint"]["comfort2"]["value"] == 21
+    restored = make_schedule(None)
+    restored.restore(snapshot, "2020-01-06T07:00:00")
+    snapshot["setpoint"]["comfort2"]["value"] = 30
+    assert restored.get_temp_for_current_mode() == 21
+
+
+def test_switch_points_returns_copy():
+    schedule = make_schedule("2020-01-06T07:00:00")
+    points = schedule.switch_points
+    assert points == SWITCH
+    points[0][SETPOINT] = "eco"
+    points.clear()
+    assert schedule.switch_points == SWITCH
+    edited = schedule.edit().switch_points
+    assert sorted(edited, key=str) == sorted(SWITCH, key=str)
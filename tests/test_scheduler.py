@@ -0,0 +1,62 @@
+import pytest
+
+from bosch_thermostat_http.exceptions import DeviceException
+from bosch_thermostat_http.scheduler import PollScheduler
+
+
+class FakeEntity:
+    def __init__(self, name, entity_type, refs):
+        self.name = name
+        self.entity_type = entity_type
+        self._refs = refs
+        self.results = {}
+        self.errors = []
+
+    def refresh_refs(self):
+        return self._refs
+
+    async def process_update(self, key, result):
+        self.results[key] = result
+
+    def finish_update(self, error=None):
+        self.errors.append(error)
+
+
+def make_get(requests, missing=()):
+    async def get(uri):
+        requests.append(uri)
+        if uri in missing:
+            raise DeviceException("missing")
+        return {"value": uri}
+
+    return get
+
+
+@pytest.mark.asyncio
+async def test_refresh_tiers_and_dedup():
+    requests = []
+    scheduler = PollScheduler(
+        make_get(requests), {"default": 1, "refs": {"status": 3, "dhw/temp": 2}}
+    )
+    hc1 = FakeEntity("hc1", "hc", {"temp": "/hc1/temp", "status": "/hc1/status"})
+    dhw1 = FakeEntity("dhw1", "dhw", {"temp": "/dhw1/temp", "outdoor": "/outdoor"})
+    sensor = FakeEntity("outdoor", "sensor", {"outdoor": "/outdoor"})
+    counts = [await scheduler.run([hc1, dhw1, sensor]) for _ in range(4)]
+    assert counts == [4, 2, 3, 3]
+    assert requests.count("/outdoor") == 4
+    assert sensor.results["outdoor"] == {"value": "/outdoor"}
+    assert dhw1.results["outdoor"] is not sensor.results["outdoor"]
+    assert scheduler.stats["deduplicated"] == 4
+
+
+@pytest.mark.asyncio
+async def test_budget_carries_over_and_reports_errors():
+    requests = []
+    scheduler = PollScheduler(make_get(requests, missing={"/b"}), budget=2)
+    entity = FakeEntity("hc1", "hc", {"a": "/a", "b": "/b", "c": "/c"})
+    assert await scheduler.run([entity]) == 2
+    assert scheduler.stats["deferred"] == 1
+    assert isinstance(entity.errors[-1], DeviceException)
+    assert await scheduler.run([entity]) == 2
+    assert requests == ["/a", "/b", "/c", "/a"]
+    assert "c" in entity.results